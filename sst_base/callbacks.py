@@ -0,0 +1,178 @@
+import time
+import numpy as np
+from event_model import DocumentRouter, compose_descriptor
+
+"""
+Callbacks that derive extra streams from the documents of a run
+"""
+
+
+class SampleCoordinateAnnotator(DocumentRouter):
+    """
+    Convert manipulator readbacks into coordinates in the frame of the
+    active sample, and emit them as an extra stream of the same run.
+
+    Every event page of the watched streams is converted in one batch,
+    which also works for flyer streams that never go through the
+    manipulator's pseudo axes. The sample frame and origin are taken
+    from the holder when the run starts.
+
+    The new stream has one event per input event, with the sample
+    coordinates ("<prefix>_sx", ..., one per manipulator axis),
+    "<prefix>_distance", the beam-to-edge distance of the sample, and
+    "<prefix>_holder_distance", the beam-to-edge distance of the holder.
+    Distances are negative when the beam is on the sample or holder.
+    """
+
+    def __init__(
+        self,
+        holder,
+        emit,
+        keys=None,
+        manipulator=None,
+        origin=None,
+        streams=("primary",),
+        stream_name="sample_coordinates",
+        prefix=None,
+    ):
+        """
+        Parameters
+        -----------
+        holder : SampleHolder
+        emit : callable
+            Called with (name, doc) for each new document
+        keys : sequence of str, optional
+            Data keys of the manipulator x, y, z, r readbacks (or of the
+            single axis for a 1D holder). Defaults to the names of the
+            manipulator's real positioners
+        manipulator : optional
+            Positioner whose manip_to_beam_frame method converts readbacks
+            to beam-centered coordinates. Defaults to holder.manipulator
+        origin : tuple, optional
+            Readbacks that put the holder origin in the beam, used when
+            the manipulator has no manip_to_beam_frame method
+        streams : sequence of str, or None
+            Names of the streams to convert. None converts every stream
+            that has all of the keys
+        stream_name : str
+            Name of the emitted stream
+        prefix : str, optional
+            Prefix of the emitted data keys. Defaults to the holder name
+        """
+        super().__init__()
+        if manipulator is None:
+            manipulator = getattr(holder, "manipulator", None)
+        if keys is None:
+            if manipulator is None:
+                raise ValueError("Either keys or a manipulator must be given")
+            keys = [m.name for m in manipulator.real_positioners]
+        self.holder = holder
+        self.emit = emit
+        self.keys = list(keys)
+        self.manipulator = manipulator
+        self.origin = origin
+        self.streams = streams
+        self.stream_name = stream_name
+        if prefix is None:
+            prefix = holder.name
+        self.prefix = prefix
+        self._clear()
+
+    def _clear(self):
+        self._start = None
+        self._bundle = None
+        self._descriptors = set()
+        self._frame = None
+        self._frame_md = {}
+
+    def _beam_position(self, positions):
+        if hasattr(self.manipulator, "manip_to_beam_frame"):
+            return tuple(self.manipulator.manip_to_beam_frame(*positions))
+        if self.origin is None:
+            return positions
+        return tuple(p - o for p, o in zip(positions, self.origin)) + tuple(positions[len(self.origin):])
+
+    def _data_keys(self):
+        names = ["sx", "sy", "sz", "sr"][: len(self.keys)] + ["distance", "holder_distance"]
+        source = f"derived:{self.holder.name}"
+        return {
+            f"{self.prefix}_{name}": {"dtype": "number", "shape": [], "source": source, "object_name": self.prefix}
+            for name in names
+        }
+
+    def _descriptor_bundle(self):
+        if self._bundle is None:
+            md = {k: self._frame_md[k] for k in ("sample_id", "origin")}
+            timestamp = time.time()
+            configuration = {
+                self.prefix: {
+                    "data": md,
+                    "timestamps": {k: timestamp for k in md},
+                    "data_keys": {
+                        k: {"dtype": "string", "shape": [], "source": f"derived:{self.holder.name}"} for k in md
+                    },
+                }
+            }
+            self._bundle = compose_descriptor(
+                start=self._start,
+                streams={},
+                event_counters={},
+                name=self.stream_name,
+                data_keys=self._data_keys(),
+                object_keys={self.prefix: list(self._data_keys())},
+                configuration=configuration,
+            )
+            self.emit("descriptor", self._bundle.descriptor_doc)
+        return self._bundle
+
+    def start(self, doc):
+        self._clear()
+        self._start = doc
+        self._frame = self.holder.current_frame
+        self._frame_md = {
+            "sample_id": f"{self.holder.sample.sample_id.get()}",
+            "origin": f"{self.holder.sample.origin.get()}",
+        }
+
+    def descriptor(self, doc):
+        if self._start is None or doc.get("name") == self.stream_name:
+            return
+        if self.streams is not None and doc.get("name") not in self.streams:
+            return
+        if all(key in doc["data_keys"] for key in self.keys):
+            self._descriptors.add(doc["uid"])
+
+    def convert(self, positions):
+        """
+        Sample coordinates and distances for arrays of manipulator
+        readbacks, in the order of keys
+
+        Returns
+        --------
+        data : dict
+            Arrays keyed by the emitted data keys
+        """
+        positions = [np.asarray(p, dtype=float) for p in positions]
+        beam = self._beam_position(positions)
+        coordinates = self._frame.beam_to_frame(*beam, origin=self._frame_md["origin"])
+        if not isinstance(coordinates, tuple):
+            coordinates = (coordinates,)
+        names = ["sx", "sy", "sz", "sr"][: len(self.keys)]
+        data = {f"{self.prefix}_{name}": np.asarray(c) for name, c in zip(names, coordinates)}
+        data[f"{self.prefix}_distance"] = np.asarray(self._frame.distance_to_beam(*beam))
+        data[f"{self.prefix}_holder_distance"] = np.asarray(self.holder.distance_to_beam(*beam))
+        return data
+
+    def event_page(self, doc):
+        if doc["descriptor"] not in self._descriptors:
+            return
+        data = self.convert([doc["data"][key] for key in self.keys])
+        n = len(doc["time"])
+        data = {k: np.broadcast_to(v, (n,)).tolist() for k, v in data.items()}
+        timestamps = {k: list(doc["time"]) for k in data}
+        bundle = self._descriptor_bundle()
+        page = bundle.compose_event_page(data=data, timestamps=timestamps, time=list(doc["time"]))
+        self.emit("event_page", page)
+
+    def stop(self, doc):
+        self._clear()
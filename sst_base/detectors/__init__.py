@@ -1,3 +1,3 @@
 from .i400 import I400
-from .scalar import ophScalar, ADCBuffer
+from .scalar import ophScalar, ADCBuffer, MultiScalarFactory, ScalarDispatcher
 from .pxicounter import PXIScalar
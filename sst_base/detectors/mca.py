@@ -19,6 +19,58 @@ class EpicsMCABase(Device):
     def __init__(self, prefix, *, name, **kwargs):
         super().__init__(prefix, name=name, **kwargs)
         self.rois = {}
+        # (keys, lower indices, upper indices) of the ROIs in the spectrum,
+        # rebuilt when the ROIs or the energy axis change
+        self._roi_table = None
+        # Last known values of the configuration that describe and read
+        # need, filled at stage and kept current by monitors
+        self._config_cache = {}
+        for sig in (self.energies, self.llim, self.ulim, self.nbins):
+            sig.subscribe(self._config_changed, run=False)
+
+    def _config_changed(self, value, obj, **kwargs):
+        self._config_cache[obj.attr_name] = value
+        self._roi_table = None
+
+    def _config_value(self, attr):
+        try:
+            return self._config_cache[attr]
+        except KeyError:
+            value = getattr(self, attr).get()
+            self._config_cache[attr] = value
+            return value
+
+    def stage(self):
+        for attr in ("energies", "llim", "ulim", "nbins"):
+            self._config_cache[attr] = getattr(self, attr).get()
+        self._roi_table = None
+        return super().stage()
+
+    def _roi_indices(self):
+        # Read the cache once, and build into a local, since a monitor
+        # callback may reset it at any time
+        table = self._roi_table
+        if table is None:
+            e = np.asarray(self._config_value("energies"))
+            lims = np.array(list(self.rois.values()), dtype=float).reshape(-1, 2)
+            keys = [self.name + "_" + roi for roi in self.rois]
+            i1 = e.searchsorted(lims[:, 0], 'left')
+            # A reversed ROI is an empty slice, as it was with np.sum
+            i2 = np.maximum(e.searchsorted(lims[:, 1], 'right'), i1)
+            table = (keys, i1, i2)
+            self._roi_table = table
+        return table
+
+    def _roi_sums(self, spectrum):
+        """
+        Sums of every ROI of spectrum from one cumulative sum. Bins past
+        the end of a short spectrum count as zero
+        """
+        keys, i1, i2 = self._roi_indices()
+        n = len(spectrum)
+        csum = np.zeros(n + 1, dtype=np.result_type(spectrum.dtype, np.int64))
+        np.cumsum(spectrum, out=csum[1:])
+        return keys, csum[np.minimum(i2, n)] - csum[np.minimum(i1, n)]
 
     @property
     def hints(self):
@@ -39,17 +91,20 @@ class EpicsMCABase(Device):
 
     def set_roi(self, label, llim, ulim, plot=False):
         self.rois[label] = (llim, ulim)
+        self._roi_table = None
         if plot:
             self.roi_hints.add(label)
 
     def clear_roi(self, label):
         self.rois.pop(label)
+        self._roi_table = None
         if label in self.roi_hints:
             self.roi_hints.remove(label)
 
     def clear_all_rois(self):
         self.rois = {}
         self.roi_hints = set()
+        self._roi_table = None
 
     def set_exposure(self, exp_time):
         self.exposure_time.set(exp_time).wait(timeout=60)
@@ -76,7 +131,7 @@ class EpicsMCABase(Device):
     def describe(self):
         d = super().describe()
         k = self.spectrum.name
-        d[k]['shape'] = [self.nbins.get()]
+        d[k]['shape'] = [int(self._config_value("nbins"))]
         d[k]['dtype'] = 'array'
         d[k]['dims'] = [self.energies.name]
         for k in self.rois:
@@ -88,17 +143,19 @@ class EpicsMCABase(Device):
     def read(self):
         r = super().read()
         k = self.spectrum.name
-        partialval = r[k]['value']
-        full_len = self.nbins.get()
-        if len(partialval) > full_len:
-            partialval = partialval[:full_len]
-        fullval = np.zeros(full_len)
-        fullval[:len(partialval)] = partialval
+        partialval = np.asarray(r[k]['value'])
+        full_len = int(self._config_value("nbins"))
+        # The IOC may send fewer bins than nbins; the rest are zero
+        partialval = partialval[:full_len]
+        if len(partialval) < full_len:
+            fullval = np.zeros(full_len)
+            fullval[:len(partialval)] = partialval
+        else:
+            fullval = partialval
         r[k]['value'] = fullval
-        e = self.energies.get()
-        for roi, (llim, ulim) in self.rois.items():
-            i1 = e.searchsorted(llim, 'left')
-            i2 = e.searchsorted(ulim, 'right')
-            key = self.name + "_" + roi
-            r[key] = {"value": np.sum(fullval[i1:i2]), "timestamp": r[k]['timestamp']}
+        if self.rois:
+            keys, sums = self._roi_sums(partialval)
+            timestamp = r[k]['timestamp']
+            for key, value in zip(keys, sums.tolist()):
+                r[key] = {"value": value, "timestamp": timestamp}
         return r
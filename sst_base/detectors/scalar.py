@@ -1,150 +1,847 @@
 from ophyd import Device, Component as Cpt, EpicsSignal, Signal
 from ophyd.status import DeviceStatus
+import functools
+import heapq
+import math
+import itertools
+import logging
 import threading
-from queue import Queue, Empty
 import time
 import numpy as np
+from .statistics import StreamingStats, robust_mask, ROBUST_MODES
 
+logger = logging.getLogger(__name__)
+
+WEIGHTING_MODES = ("none", "time")
+
+
+class _Scheduler:
+    """
+    One daemon thread that runs delayed calls for every scalar device,
+    instead of a sleeping thread per trigger
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay, func, *args):
+        """
+        Call func(*args) on the scheduler thread after delay seconds
+        """
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scalar-scheduler", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), func, args))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                deadline, _, func, args = self._queue[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+            try:
+                func(*args)
+            except Exception:
+                logger.exception("Error in scalar scheduler callback %r", func)
+
+
+_scheduler = _Scheduler()
+
+
+class ScalarDispatcher:
+    """
+    Optional single consumer for the monitor updates of many scalar
+    devices.
+
+    Registered targets only queue their updates from the monitor callback,
+    which keeps the work done on the control layer's callback thread to a
+    tuple append. One dispatcher thread drains the queue in batches and
+    hands each device its updates at once. The queue is bounded; updates
+    that arrive while it is full are dropped and counted per device. An
+    error in a device is logged and fails that device's pending trigger.
+    """
+
+    def __init__(self, maxsize=100000):
+        """
+        Parameters
+        -----------
+        maxsize : int
+            Largest number of queued updates
+        """
+        self.maxsize = maxsize
+        self._queue = []
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._busy = False
+        self._thread = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._lock:
+            self._received = 0
+            self._dispatched = 0
+            self._batches = 0
+            self._dropped = {}
+            self._max_queue = 0
+            self._callback_time = 0.0
+            self._dispatch_time = 0.0
+
+    def subscribe(self, device, channel, target):
+        """
+        Route the monitor updates of target to device._receive_many as
+        channel
+
+        Returns
+        --------
+        cid : int
+            Subscription id, for target.unsubscribe
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scalar-dispatcher", daemon=True)
+                self._thread.start()
+        return target.subscribe(functools.partial(self._enqueue, device, channel), run=False)
+
+    def _enqueue(self, device, channel, value, timestamp=None, **kwargs):
+        t0 = time.perf_counter()
+        now = time.time()
+        if timestamp is None:
+            timestamp = now
+        with self._lock:
+            self._received += 1
+            n = len(self._queue)
+            if n >= self.maxsize:
+                self._dropped[device.name] = self._dropped.get(device.name, 0) + 1
+            else:
+                self._queue.append((device, channel, value, timestamp, now))
+                if n >= self._max_queue:
+                    self._max_queue = n + 1
+                if n == 0:
+                    self._condition.notify_all()
+            self._callback_time += time.perf_counter() - t0
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                batch = self._queue
+                self._queue = []
+                self._busy = True
+            t0 = time.perf_counter()
+            updates = {}
+            for device, *update in batch:
+                updates.setdefault(device, []).append(update)
+            for device, device_updates in updates.items():
+                try:
+                    device._receive_many(*zip(*device_updates))
+                except Exception as exc:
+                    logger.exception("Error dispatching updates to %s", device.name)
+                    device._fail(device._window, exc)
+            with self._condition:
+                self._dispatched += len(batch)
+                self._batches += 1
+                self._dispatch_time += time.perf_counter() - t0
+                self._busy = False
+                self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued update has been handed to its device
+
+        Returns
+        --------
+        flushed : bool
+            False if the timeout passed first
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def metrics(self):
+        """
+        Counters since the last reset_metrics
+
+        Returns
+        --------
+        metrics : dict
+            received, dispatched and dropped updates, dropped updates per
+            device, the number of batches, the longest queue, and the mean
+            time in microseconds spent per update in the monitor callback
+            and in the dispatcher
+        """
+        with self._lock:
+            return {
+                "received": self._received,
+                "dispatched": self._dispatched,
+                "dropped": sum(self._dropped.values()),
+                "dropped_by_device": dict(self._dropped),
+                "batches": self._batches,
+                "max_queue": self._max_queue,
+                "queued": len(self._queue),
+                "callback_us": 1e6 * self._callback_time / max(self._received, 1),
+                "dispatch_us": 1e6 * self._dispatch_time / max(self._dispatched, 1),
+            }
+
+
+class _Window:
+    """
+    State of one exposure, from trigger until its status is finished. Each
+    channel has its own statistics, over the same window
+    """
+
+    def __init__(
+        self, status, start, exposure, max_points, calibration, robust=None, offsets=None, weighted=False
+    ):
+        self.status = status
+        self.start = start
+        self.end = start + exposure
+        self.exposure = exposure
+        self.max_points = max_points
+        # (rescale, offset) of each channel
+        self.calibration = calibration
+        self.retries = 0
+        self.stats = [StreamingStats() for _ in calibration]
+        # Channels that have seen their last sample of the window
+        self.done = set()
+        # (mode, threshold, fraction), or None to publish the streaming
+        # statistics
+        self.robust = robust
+        # Host clock minus IOC clock of each channel, frozen at trigger, or
+        # None until the first sample of a channel that had not posted yet
+        self.offsets = offsets if offsets is not None else [0.0] * len(calibration)
+        self.weighted = weighted
+        # With time weighting, the last (value, host time) of each channel,
+        # whose weight is only known once the next sample arrives, and
+        # the time its hold ends if the channel closes early
+        self.pending = [None] * len(calibration)
+        self.stop = [self.end] * len(calibration)
+        # Squared standard errors of the mean, in raw units, at which each
+        # channel has counted long enough (None when not adaptive), and
+        # the exposure before the window may close on them
+        self.targets = None
+        self.min_exposure = 0.0
+        self.elapsed = exposure
+
+    def converged(self):
+        """
+        True when every channel with a target has a standard error of the
+        mean below it. Time-weighted windows use the effective sample
+        size, so that samples held only briefly add little
+        """
+        for stats, target in zip(self.stats, self.targets):
+            if target > 0:
+                n = stats.effective_count if self.weighted else stats.count
+                if n < 2 or stats.variance >= target * (n - 1):
+                    return False
+        return True
+
+    def has_samples(self, channel):
+        return self.stats[channel].count > 0 or self.pending[channel] is not None
+
+    def npoints(self, channel):
+        return self.stats[channel].count + (self.pending[channel] is not None)
+
+    def flush(self, channel):
+        """
+        Add the pending sample of a time-weighted channel, held until the
+        end of the window
+        """
+        pending = self.pending[channel]
+        if pending is not None:
+            value, t = pending
+            self.stats[channel].add(value, max(self.stop[channel] - max(t, self.start), 0.0))
+            self.pending[channel] = None
+
+
+class _SampleBuffer:
+    """
+    Preallocated columns of raw values, their timestamps and the index of
+    the channel they came from. Appending only writes three numbers, so it
+    is cheap enough for the monitor callback. The arrays double in size
+    when full; readers take views up to the size they saw, which stay
+    valid across a resize.
+    """
+
+    def __init__(self, capacity=1024):
+        self._values = np.empty(capacity)
+        self._times = np.empty(capacity)
+        self._channels = np.empty(capacity, dtype=np.intp)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, values, timestamps, channels):
+        n = self.size
+        m = len(values)
+        while n + m > len(self._values):
+            self._grow()
+        self._values[n:n + m] = values
+        self._times[n:n + m] = timestamps
+        self._channels[n:n + m] = channels
+        self.size = n + m
+
+    def append(self, value, timestamp, channel=0):
+        n = self.size
+        if n == len(self._values):
+            self._grow()
+        self._values[n] = value
+        self._times[n] = timestamp
+        self._channels[n] = channel
+        self.size = n + 1
+
+    def _grow(self):
+        n = self.size
+        values = np.empty(2 * len(self._values))
+        times = np.empty(2 * len(self._times))
+        channels = np.empty(2 * len(self._channels), dtype=np.intp)
+        values[:n] = self._values[:n]
+        times[:n] = self._times[:n]
+        channels[:n] = self._channels[:n]
+        self._values = values
+        self._times = times
+        self._channels = channels
+
+    def clear(self):
+        self.size = 0
+
+    def arrays(self, start=0, stop=None):
+        """
+        Views of the raw values and timestamps from start to stop, by
+        default up to the current size
+        """
+        if stop is None:
+            stop = self.size
+        return self._values[start:stop], self._times[start:stop]
+
+    def channels(self, start=0, stop=None):
+        """
+        View of the channel indices from start to stop
+        """
+        if stop is None:
+            stop = self.size
+        return self._channels[start:stop]
+
+
+class ScalarChannel(Device):
+    """
+    Statistics and calibration of one scalar channel. Subclasses, or the
+    component that creates the channel, provide the target signal. A
+    positive sem_target, in calibrated units, makes exposures adaptive
+    (see MultiScalarBase)
+    """
 
-class ScalarBase(Device):
-    exposure_time = Cpt(Signal, name="exposure_time", kind="config")
     mean = Cpt(Signal, name="", kind="hinted")
     median = Cpt(Signal, name="median", kind="omitted")
     std = Cpt(Signal, name="std", kind="omitted")
     npts = Cpt(Signal, name="points", kind="omitted")
     sum = Cpt(Signal, name="sum", kind="omitted")
+    min = Cpt(Signal, name="min", kind="omitted")
+    max = Cpt(Signal, name="max", kind="omitted")
+    nrejected = Cpt(Signal, value=0, name="nrejected", kind="omitted")
     rescale = Cpt(Signal, value=1, name="rescale", kind="config")
     offset = Cpt(Signal, value=0, name="offset", kind="config")
     gain = Cpt(Signal, value=1, name="gain", kind="config")
+    sem_target = Cpt(Signal, value=0, name="sem_target", kind="config")
 
     def __init__(self, *args, rescale=1, gain=1, **kwargs):
-        self._flying = False
-        self._measuring = False
-        self._reading = False
-        self._flyer_buffer = []
-        self._flyer_time_buffer = []
+        """
+        Parameters
+        -----------
+        rescale : float
+            Initial rescale factor
+        gain : float
+            Initial gain
+        """
         self._secret_buffer = []
         self._secret_time_buffer = []
+        self._rescale = 1
+        self._offset = 0
         super().__init__(*args, **kwargs)
         self.mean.name = self.name
+        self.rescale.subscribe(self._cache_rescale)
+        self.offset.subscribe(self._cache_offset)
         self.rescale.set(rescale).wait(timeout=60)
         self.gain.set(gain).wait(timeout=5)
 
+    def _cache_rescale(self, value, **kwargs):
+        self._rescale = value
+
+    def _cache_offset(self, value, **kwargs):
+        self._offset = value
+
+    def _calibrate(self, raw, calibration=None):
+        """
+        Apply rescale and offset to an array of raw values
+        """
+        if calibration is None:
+            calibration = (self._rescale, self._offset)
+        rescale, offset = calibration
+        return raw * rescale - offset
+
+    def _publish(self, stats, calibration, raw=None, robust=None):
+        """
+        Put the statistics of one exposure into the statistics signals
+
+        Parameters
+        -----------
+        stats : StreamingStats
+            Statistics of the raw samples
+        calibration : tuple
+            (rescale, offset) at trigger
+        raw : array, optional
+            Raw samples of the window, needed when robust is given
+        robust : tuple, optional
+            (mode, threshold, fraction) of robust_mask
+        """
+        rescale, offset = calibration
+        nrejected = 0
+        if robust is not None and stats.count > 0:
+            buf = self._calibrate(raw, calibration)
+            keep = robust_mask(buf, *robust)
+            nrejected = len(buf) - np.count_nonzero(keep)
+            buf = buf[keep]
+
+        if stats.count == 0 or (robust is not None and len(buf) == 0):
+            # No samples, or every sample was rejected
+            self.mean.put(np.nan)
+            self.median.put(np.nan)
+            self.std.put(np.nan)
+            self.npts.put(0)
+            self.sum.put(np.nan)
+            self.min.put(np.nan)
+            self.max.put(np.nan)
+
+        elif robust is not None:
+            self.mean.put(np.mean(buf))
+            self.median.put(np.median(buf))
+            self.std.put(np.std(buf))
+            self.npts.put(len(buf))
+            self.sum.put(np.sum(buf))
+            self.min.put(np.min(buf))
+            self.max.put(np.max(buf))
+
+        else:
+            # Calibration is linear, so it applies directly to the raw
+            # statistics
+            lower, upper = sorted((stats.min * rescale - offset, stats.max * rescale - offset))
+            self.mean.put(stats.mean * rescale - offset)
+            self.median.put(stats.median * rescale - offset)
+            self.std.put(stats.std * abs(rescale))
+            self.npts.put(stats.count)
+            self.sum.put(stats.sum * rescale - stats.count * offset)
+            self.min.put(lower)
+            self.max.put(upper)
+        self.nrejected.put(nrejected)
+
+
+class MultiScalarBase(Device):
+    """
+    Several scalar channels measured over one shared exposure window.
+
+    Every ScalarChannel component is a channel. Samples of all channels go
+    into one columnar buffer, a single trigger status covers all of them,
+    and the statistics of each channel come from the same window, so that
+    ratios of channels are taken over identical times. The window closes
+    once every channel has a sample stamped after its end (or max_points
+    samples), and otherwise from a shared scheduler shortly after the
+    exposure time
+
+    Samples are placed in the window by the IOC timestamp of the monitor
+    update, not by when the callback runs, so a busy client does not move
+    samples between windows. Each channel's IOC clock is mapped to the
+    host clock by the smallest delay seen between a timestamp and its
+    callback while staged, updated under the same lock as the open window.
+    A channel that has not posted yet when a window opens takes the delay
+    of its first sample in the window. With weighting set to "time", each
+    sample is weighted by how long it was held within the window,
+    including the value held when the window opened, which suits channels
+    that only post on change.
+
+    Setting sem_target on any channel makes exposures adaptive: the window
+    closes as soon as every channel with a target has a standard error of
+    the mean below it, but not before min_exposure, and exposure_time
+    becomes the longest exposure. elapsed holds the length of the last
+    window.
+    """
+
+    exposure_time = Cpt(Signal, name="exposure_time", kind="config")
+    max_points = Cpt(Signal, value=0, name="max_points", kind="config")
+    robust_mode = Cpt(Signal, value="none", name="robust_mode", kind="config")
+    robust_threshold = Cpt(Signal, value=3.0, name="robust_threshold", kind="config")
+    trim_fraction = Cpt(Signal, value=0.1, name="trim_fraction", kind="config")
+    weighting = Cpt(Signal, value="none", name="weighting", kind="config")
+    min_exposure = Cpt(Signal, value=0, name="min_exposure", kind="config")
+    elapsed = Cpt(Signal, value=0, name="elapsed", kind="omitted")
+
+    def __init__(self, *args, retain_samples=False, dispatcher=None, **kwargs):
+        """
+        Parameters
+        -----------
+        retain_samples : bool
+            Keep the calibrated samples and timestamps of every exposure
+            since stage in the _secret_buffer and _secret_time_buffer of
+            each channel. Off by default, so that long exposures use
+            constant memory
+        dispatcher : ScalarDispatcher, optional
+            Receive monitor updates through a dispatcher shared with other
+            devices, instead of from a callback per target
+        """
+        self.retain_samples = retain_samples
+        self._dispatcher = dispatcher
+        self._flying = False
+        self._measuring = False
+        self._reading = False
+        self._window = None
+        # Guards the open window, the clock offsets and the sample buffer.
+        # Reentrant, since the monitor callback closes windows while
+        # holding it
+        self._window_lock = threading.RLock()
+        self._subscriptions = []
+        # Raw samples; rescale and offset are applied when statistics or
+        # events are produced, not in the monitor callback
+        self._buffer = _SampleBuffer()
+        self._flyer_buffer = _SampleBuffer()
+        self._flyer_collected = 0
+        super().__init__(*args, **kwargs)
+        self._channels = self._find_channels()
+        self._clock_offsets = [math.inf] * len(self._channels)
+        self._last = [None] * len(self._channels)
+
+    def _find_channels(self):
+        return [
+            getattr(self, attr) for attr, cpt in self._sig_attrs.items() if issubclass(cpt.cls, ScalarChannel)
+        ]
+
+    @property
+    def channels(self):
+        return list(self._channels)
+
+    def _subscribe(self):
+        if not self._measuring:
+            if self._dispatcher is not None:
+                self._subscriptions = [
+                    (channel.target, self._dispatcher.subscribe(self, index, channel.target))
+                    for index, channel in enumerate(self._channels)
+                ]
+            else:
+                self._subscriptions = [
+                    (channel.target, channel.target.subscribe(functools.partial(self._aggregate, i), run=False))
+                    for i, channel in enumerate(self._channels)
+                ]
+            self._measuring = True
+
+    def _unsubscribe(self):
+        if self._measuring:
+            for target, cid in self._subscriptions:
+                target.unsubscribe(cid)
+            self._subscriptions = []
+            self._measuring = False
+
     def kickoff(self):
-        self._flyer_buffer = []
-        self._flyer_time_buffer = []
-        self._flyer_timestamp_buffer = []
-        self._flyer_queue = Queue()
+        self._flyer_buffer.clear()
+        self._flyer_collected = 0
         kickoff_st = DeviceStatus(device=self)
         kickoff_st.set_finished()
         self._flying = True
-        if not self._measuring:
-            self.target.subscribe(self._aggregate, run=False)
-            self._measuring = True
+        self._subscribe()
 
         return kickoff_st
 
     def stage(self):
-        self._secret_buffer = []
-        self._secret_time_buffer = []
-        self._buffer = []
-        self._time_buffer = []
+        for channel in self._channels:
+            channel._secret_buffer = []
+            channel._secret_time_buffer = []
+        self._buffer.clear()
         self._reading = True
-        if not self._measuring:
-            self.target.subscribe(self._aggregate, run=False)
-            self._measuring = True
+        self._subscribe()
         return super().stage()
 
     def unstage(self):
-        if self._measuring:
-            self.target.clear_sub(self._aggregate)
-            self._measuring = False
+        self._unsubscribe()
         self._reading = False
         return super().unstage()
 
     def set_exposure(self, exp_time):
         self.exposure_time.set(exp_time).wait(timeout=60)
 
-    def _aggregate(self, value, **kwargs):
-        scale_value = value * self.rescale.get() - self.offset.get()
-        t = time.time()
+    @property
+    def clock_offsets(self):
+        """
+        Estimated host clock minus IOC clock of each channel, 0 until a
+        channel has posted while staged
+        """
+        with self._window_lock:
+            return [offset if offset != math.inf else 0.0 for offset in self._clock_offsets]
+
+    def _aggregate(self, channel, value, timestamp=None, **kwargs):
+        now = time.time()
+        if timestamp is None:
+            timestamp = now
+        try:
+            if self._reading:
+                self._read_sample(channel, value, timestamp, now)
+            if self._flying:
+                self._flyer_buffer.append(value, timestamp, channel)
+        except Exception as exc:
+            # The control layer only logs callback errors
+            self._fail(self._window, exc)
+            raise
+
+    def _receive_many(self, channels, values, timestamps, arrivals):
+        """
+        Take a batch of updates from a ScalarDispatcher, as sequences of
+        channel indices, raw values, IOC timestamps and callback times
+        """
         if self._reading:
-            self._buffer.append(scale_value)
-            self._time_buffer.append(t)
+            for update in zip(channels, values, timestamps, arrivals):
+                self._read_sample(*update)
         if self._flying:
-            event = dict()
-            event["time"] = t
-            event["data"] = dict()
-            event["timestamps"] = dict()
-            event["data"][self.name] = scale_value
-            event["timestamps"][self.name] = kwargs.get("timestamp", t)
-            self._flyer_buffer.append(scale_value)
-            self._flyer_time_buffer.append(t)
-            self._flyer_timestamp_buffer.append(kwargs.get("timestamp", t))
-            self._flyer_queue.put(event)
-
-    def _acquire(self, status):
-        self._buffer = []
-        self._time_buffer = []
-        time.sleep(self.exposure_time.get())
-        if len(self._buffer) == 0:
-            ntry = 10
-            n = 0
-            while len(self._buffer) < 1:
-                time.sleep(0.1 * self.exposure_time.get())
-                n += 1
-                if n > ntry:
-                    break
-        buf = np.array(self._buffer)
-        tbuf = np.array(self._time_buffer[: len(buf)])
-        if len(buf) == 0:
-            self.mean.put(np.nan)
-            self.median.put(np.nan)
-            self.std.put(np.nan)
-            self.npts.put(0)
-            self.sum.put(np.nan)
+            self._flyer_buffer.extend(values, timestamps, channels)
+
+    def _read_sample(self, channel, value, timestamp, now):
+        with self._window_lock:
+            self._last[channel] = (value, timestamp)
+            # Callbacks only ever run late, so the smallest delay is
+            # closest to the clock offset
+            if now - timestamp < self._clock_offsets[channel]:
+                self._clock_offsets[channel] = now - timestamp
+            window = self._window
+            if window is not None:
+                self._add_to_window(window, channel, value, timestamp)
 
+    def _add_to_window(self, window, channel, value, timestamp):
+        """
+        Update the window statistics of a channel from the monitor
+        callback. A channel is done once it has a sample stamped after the
+        end of the exposure (that sample is not part of the window), or
+        once max_points samples have arrived, and the window closes when
+        every channel is done. Called with the window lock held
+        """
+        if channel in window.done or self._window is not window:
+            return
+        offset = window.offsets[channel]
+        if offset is None:
+            # The channel had not posted when the window opened
+            offset = window.offsets[channel] = self._clock_offsets[channel]
+        t = timestamp + offset
+        if t < window.start:
+            # Stamped before the window opened, but delivered late
+            if window.weighted:
+                window.pending[channel] = (value, t)
+            return
+        if t >= window.end and window.has_samples(channel):
+            self._channel_done(window, channel)
+            return
+        if window.weighted:
+            pending = window.pending[channel]
+            if pending is not None:
+                window.stats[channel].add(pending[0], t - max(pending[1], window.start))
+            window.pending[channel] = (value, t)
         else:
-            self.mean.put(np.mean(buf))
-            self.median.put(np.median(buf))
-            self.std.put(np.std(buf))
-            self.npts.put(len(buf))
-            self.sum.put(np.sum(buf))
-        self._secret_buffer.append(buf)
-        self._secret_time_buffer.append(tbuf)
-        status.set_finished()
-        return
+            window.stats[channel].add(value)
+        if self.retain_samples or window.robust is not None:
+            self._buffer.append(value, timestamp, channel)
+        if window.max_points > 0 and window.npoints(channel) >= window.max_points:
+            # The hold of the last sample ends with it
+            window.stop[channel] = t
+            self._channel_done(window, channel)
+        elif window.targets is not None and t - window.start >= window.min_exposure and window.converged():
+            window.stop = [t] * len(window.stats)
+            window.elapsed = t - window.start
+            self._finish(window)
+
+    def _channel_done(self, window, channel):
+        window.done.add(channel)
+        if len(window.done) == len(window.stats):
+            self._finish(window)
+
+    def _deadline(self, window):
+        """
+        Close the window from the scheduler when the monitors have gone
+        quiet. While a channel has no samples at all, wait up to ten more
+        tenths of the exposure for one
+        """
+        with self._window_lock:
+            if self._window is not window:
+                return
+            try:
+                if all(window.has_samples(i) for i in range(len(window.stats))) or window.retries >= 10:
+                    self._finish(window)
+                else:
+                    window.retries += 1
+                    _scheduler.schedule(0.1 * window.exposure, self._deadline, window)
+            except Exception as exc:
+                self._fail(window, exc)
+                raise
+
+    def _fail(self, window, exc):
+        """
+        Close a window that could not be finished, failing its status with
+        exc, so that an error can not leave a trigger waiting forever
+        """
+        with self._window_lock:
+            if window is None or self._window is not window:
+                return
+            self._window = None
+            window.status.set_exception(exc)
+
+    def _finish(self, window):
+        with self._window_lock:
+            if self._window is not window:
+                return
+            self._window = None
+            try:
+                self._publish_window(window)
+            except Exception as exc:
+                # The window is already closed, so nothing else would
+                # finish the status
+                window.status.set_exception(exc)
+                raise
+            window.status.set_finished()
+
+    def _publish_window(self, window):
+        raw, times = self._buffer.arrays()
+        indices = self._buffer.channels()
+        single = len(self._channels) == 1
+        for index, channel in enumerate(self._channels):
+            window.flush(index)
+            if single:
+                channel_raw, channel_times = raw, times
+            else:
+                selected = indices == index
+                channel_raw, channel_times = raw[selected], times[selected]
+            channel._publish(window.stats[index], window.calibration[index], channel_raw, window.robust)
+            if self.retain_samples:
+                channel._secret_buffer.append(channel._calibrate(channel_raw, window.calibration[index]))
+                channel._secret_time_buffer.append(channel_times.copy())
+        self.elapsed.put(window.elapsed)
 
     def trigger(self):
+        """
+        Start an exposure of every channel. The status finishes from the
+        monitor callbacks when every channel has a sample whose timestamp
+        passes the end of the exposure or has max_points samples, and
+        otherwise from a shared scheduler shortly after the exposure time.
+        Adaptive exposures also finish once the standard errors reach their
+        targets. Robust modes compute unweighted statistics of the kept
+        samples. Triggering again while an exposure is open fails the
+        status of the open exposure
+        """
         status = DeviceStatus(self)
-        threading.Thread(target=self._acquire, args=(status,), daemon=True).start()
+        exposure = self.exposure_time.get()
+        robust = None
+        mode = self.robust_mode.get()
+        if mode not in ROBUST_MODES:
+            raise ValueError(f"Unknown robust mode {mode}, expected one of {ROBUST_MODES}")
+        if mode != "none":
+            robust = (mode, self.robust_threshold.get(), self.trim_fraction.get())
+        weighting = self.weighting.get()
+        if weighting not in WEIGHTING_MODES:
+            raise ValueError(f"Unknown weighting {weighting}, expected one of {WEIGHTING_MODES}")
+        calibration = [(channel._rescale, channel._offset) for channel in self._channels]
+        window = _Window(
+            status,
+            time.time(),
+            exposure,
+            self.max_points.get(),
+            calibration,
+            robust,
+            None,
+            weighting == "time" and robust is None,
+        )
+        targets = [channel.sem_target.get() for channel in self._channels]
+        if any(target > 0 for target in targets):
+            window.targets = [
+                (target / rescale) ** 2 if target > 0 and rescale != 0 else 0
+                for target, (rescale, _) in zip(targets, calibration)
+            ]
+            window.min_exposure = self.min_exposure.get()
+        with self._window_lock:
+            # Offsets and held values as of the swap, so no update falls
+            # between them and the new window
+            window.offsets = [offset if offset != math.inf else None for offset in self._clock_offsets]
+            if window.weighted:
+                for index, last in enumerate(self._last):
+                    if last is not None:
+                        window.pending[index] = (last[0], last[1] + window.offsets[index])
+            # An exposure that is still open would otherwise never finish
+            self._fail(self._window, RuntimeError(f"{self.name} was triggered again before its exposure finished"))
+            self._buffer.clear()
+            self._window = window
+        _scheduler.schedule(1.1 * exposure, self._deadline, window)
         return status
 
     def collect(self):
-        events = []
-        while True:
-            try:
-                e = self._flyer_queue.get_nowait()
-                events.append(e)
-            except Empty:
-                break
-        yield from events
+        start = self._flyer_collected
+        raw, times = self._flyer_buffer.arrays(start)
+        indices = self._flyer_buffer.channels(start)
+        self._flyer_collected = start + len(raw)
+        rescale = np.array([channel._rescale for channel in self._channels])
+        offset = np.array([channel._offset for channel in self._channels])
+        values = raw * rescale[indices] - offset[indices]
+        names = [channel.name for channel in self._channels]
+        for v, t, i in zip(values.tolist(), times.tolist(), indices.tolist()):
+            yield {"time": t, "data": {names[i]: v}, "timestamps": {names[i]: t}}
 
     def complete(self):
+        self._unsubscribe()
+        if self._dispatcher is not None:
+            self._dispatcher.flush(timeout=10)
         self._flying = False
-        if self._measuring:
-            self.target.clear_sub(self._aggregate)
-            self._measuring = False
         completion_status = DeviceStatus(self)
         completion_status.set_finished()
         return completion_status
 
     def describe_collect(self):
-        dd = dict({self.name: {"source": self.target.pvname, "dtype": "number", "shape": []}})
-        return {self.name + "_monitor": dd}
+        return {
+            channel.name + "_monitor": {
+                channel.name: {"source": channel.target.pvname, "dtype": "number", "shape": []}
+            }
+            for channel in self._channels
+        }
 
     def get_plot_hints(self):
-        return [self.mean.name]
+        return [channel.mean.name for channel in self._channels]
+
+
+class ScalarBase(ScalarChannel, MultiScalarBase):
+    """
+    A single scalar channel, which is its own target and statistics
+    """
+
+    def __init__(self, *args, rescale=1, gain=1, retain_samples=False, dispatcher=None, **kwargs):
+        """
+        Parameters
+        -----------
+        rescale : float
+            Initial rescale factor
+        gain : float
+            Initial gain
+        retain_samples : bool
+            Keep the calibrated samples and timestamps of every exposure
+            since stage in _secret_buffer and _secret_time_buffer. Off by
+            default, so that long exposures use constant memory
+        dispatcher : ScalarDispatcher, optional
+            Receive monitor updates through a dispatcher shared with other
+            devices
+        """
+        super().__init__(
+            *args, rescale=rescale, gain=gain, retain_samples=retain_samples, dispatcher=dispatcher, **kwargs
+        )
+
+    def _find_channels(self):
+        return [self]
 
 
 class I400SingleCh(ScalarBase):
@@ -169,3 +866,34 @@ class ophScalar(ScalarBase):
     """Generic Scalar.  Give full path to target PV during object creation"""
 
     target = Cpt(EpicsSignal, "", kind="omitted")
+
+
+class ophScalarChannel(ScalarChannel):
+    """Channel of a MultiScalarBase, target PV is the channel prefix"""
+
+    target = Cpt(EpicsSignal, "", kind="omitted")
+
+
+def MultiScalarFactory(prefix, *args, channels, **kwargs):
+    """
+    Create a MultiScalarBase device with one channel per target PV
+
+    Parameters
+    ----------
+    prefix : str
+        Common PV prefix of the targets
+    channels : dict
+        Channel attribute names mapped to the rest of each target PV
+    **kwargs : dict
+        Additional keyword arguments passed to MultiScalarBase
+
+    Returns
+    -------
+    Device
+        Multi-channel scalar device
+    """
+    components = {attr: Cpt(ophScalarChannel, suffix, kind="hinted") for attr, suffix in channels.items()}
+    return type("MultiScalar", (MultiScalarBase,), components)(prefix, *args, **kwargs)
+
+
+# testMulti = MultiScalarFactory("XF:07ID-BI{DM2:I400-1}:", name="i400", channels={"i0": "IC1_MON"})
@@ -0,0 +1,223 @@
+import math
+import numpy as np
+
+"""
+Statistics for scalar detectors. StreamingStats is updated one sample at
+a time, in constant memory, so that it is complete as soon as the last
+sample of an exposure arrives. robust_mask rejects outliers from a whole
+exposure window at once.
+"""
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P-square algorithm of Jain and
+    Chlamtac (1985), which tracks five markers instead of keeping the
+    samples. Exact for up to five samples.
+    """
+
+    def __init__(self, p=0.5):
+        self.p = p
+        self.reset()
+
+    def reset(self):
+        self._initial = []
+        self._q = None
+
+    def add(self, x):
+        if self._q is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                p = self.p
+                self._q = sorted(self._initial)
+                self._n = [0, 1, 2, 3, 4]
+                self._np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+                self._dn = [0, p / 2, p, (1 + p) / 2, 1]
+            return
+        q = self._q
+        n = self._n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    @property
+    def value(self):
+        if self._q is not None:
+            return self._q[2]
+        if len(self._initial) == 0:
+            return math.nan
+        return _exact_quantile(sorted(self._initial), self.p)
+
+
+def _exact_quantile(values, p):
+    """
+    Quantile of sorted values with linear interpolation, as numpy does
+    """
+    position = p * (len(values) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (position - lower) * (values[upper] - values[lower])
+
+
+class StreamingStats:
+    """
+    Count, sum, mean and variance (West's weighted form of Welford's
+    algorithm), minimum, maximum and a P-square median of a stream of
+    samples. Weights default to one; only the mean and variance are
+    weighted. Minimum and maximum skip NaN samples.
+    """
+
+    def __init__(self):
+        self._median = P2Quantile(0.5)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.weight = 0.0
+        self._w2 = 0.0
+        self._sum = 0.0
+        self.mean = math.nan
+        self._m2 = 0.0
+        self.min = math.nan
+        self.max = math.nan
+        self._median.reset()
+
+    def add(self, x, weight=1.0):
+        self.count += 1
+        self._sum += x
+        if math.isnan(self.min):
+            # Comparisons with NaN are always false, so a NaN seed would
+            # never be replaced
+            if math.isfinite(x):
+                self.min = x
+                self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+        if weight > 0:
+            self._w2 += weight * weight
+            if self.weight == 0:
+                self.weight = weight
+                self.mean = x
+            else:
+                self.weight += weight
+                delta = x - self.mean
+                self.mean += delta * weight / self.weight
+                self._m2 += weight * delta * (x - self.mean)
+        self._median.add(x)
+
+    @property
+    def sum(self):
+        return self._sum if self.count > 0 else math.nan
+
+    @property
+    def variance(self):
+        """
+        Population variance, as np.var (with weights, as the weighted
+        variance about the weighted mean)
+        """
+        return self._m2 / self.weight if self.weight > 0 else math.nan
+
+    @property
+    def effective_count(self):
+        """
+        Kish effective sample size, (sum of weights)**2 / sum of squared
+        weights, which is the count of weighted samples when the weights
+        are equal
+        """
+        return self.weight * self.weight / self._w2 if self._w2 > 0 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self):
+        return self._median.value
+
+
+ROBUST_MODES = ("none", "sigma_clip", "mad", "trimmed")
+
+
+def robust_mask(values, mode, threshold=3.0, fraction=0.1, maxiters=5):
+    """
+    Mask of the samples kept by an outlier-rejecting estimator
+
+    Parameters
+    -----------
+    values : array
+    mode : str
+        "none" keeps everything. "sigma_clip" iteratively rejects samples
+        more than threshold standard deviations from the mean. "mad"
+        rejects samples more than threshold robust standard deviations
+        (1.4826 median absolute deviations) from the median. "trimmed"
+        rejects the lowest and highest fraction of the samples
+    threshold : float
+        Rejection threshold for "sigma_clip" and "mad"
+    fraction : float
+        Fraction trimmed from each end for "trimmed"
+    maxiters : int
+        Maximum number of "sigma_clip" iterations
+
+    Returns
+    --------
+    keep : array of bool
+    """
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    if mode == "none" or len(values) < 3:
+        return keep
+    if mode == "sigma_clip":
+        for _ in range(maxiters):
+            if not np.any(keep):
+                break
+            kept = values[keep]
+            std = np.std(kept)
+            new_keep = keep & (np.abs(values - np.mean(kept)) <= threshold * std)
+            if std == 0 or np.array_equal(new_keep, keep):
+                break
+            keep = new_keep
+        return keep
+    if mode == "mad":
+        kept = values[keep]
+        median = np.median(kept)
+        mad = 1.4826 * np.median(np.abs(kept - median))
+        if mad == 0:
+            # More than half of the samples are identical, which gives no
+            # scale to reject against
+            return keep
+        return keep & (np.abs(values - median) <= threshold * mad)
+    if mode == "trimmed":
+        n = int(np.count_nonzero(keep))
+        ntrim = int(fraction * n)
+        if ntrim == 0:
+            return keep
+        order = np.argsort(np.where(keep, values, np.inf), kind="stable")
+        trimmed = np.zeros(len(values), dtype=bool)
+        trimmed[order[ntrim:n - ntrim]] = True
+        return trimmed
+    raise ValueError(f"Unknown robust mode {mode}, expected one of {ROBUST_MODES}")
@@ -0,0 +1,220 @@
+import numpy as np
+from .linalg import constructBasis, changeBasisMatrix, deg_to_rad, rotz, rotAxisMat
+
+"""
+Module that fits holder geometry to edge crossings measured in alignment scans
+
+An edge crossing is a manipulator pose (x, y, z, r, beam-centered) at which
+the beam was found on one of the two long edges of a side. Edge 0 is the
+x = 0 edge of the side frame and edge 1 is the x = width edge. All fits are
+done in the coordinates of the top-level (unrotated) holder frame, where
+the beam of each pose is a line. A crossing only says that this line meets
+the edge line, so each crossing constrains the distance between the two
+lines, across the beam, and nothing along it.
+"""
+
+
+def beam_points(poses):
+    """
+    Holder coordinates of the point that sits at the beam origin for each
+    pose
+
+    Parameters
+    -----------
+    poses : array, shape (n, 4)
+        Beam-centered manipulator x, y, z, r (degrees)
+
+    Returns
+    --------
+    points : array, shape (n, 3)
+    """
+    poses = np.atleast_2d(np.asarray(poses, dtype=float))
+    return rotz(deg_to_rad(poses[:, 3]), -poses[:, :3])
+
+
+def beam_directions(poses):
+    """
+    Holder coordinates of the beam direction (global y) for each pose
+
+    Parameters
+    -----------
+    poses : array, shape (n, 4)
+        Beam-centered manipulator x, y, z, r (degrees)
+
+    Returns
+    --------
+    directions : array, shape (n, 3)
+    """
+    poses = np.atleast_2d(np.asarray(poses, dtype=float))
+    y = np.zeros((len(poses), 3))
+    y[:, 1] = 1
+    return rotz(deg_to_rad(poses[:, 3]), y)
+
+
+def _line_distances(q, u, a, d):
+    """
+    Signed distances between beam lines (q, u) and edge lines (a, d), with
+    unit directions
+
+    Returns
+    --------
+    distance : array, shape (n,)
+    normal : array, shape (n, 3)
+        Unit common normal of each pair of lines
+    closest : array, shape (n, 3)
+        Point of each edge line closest to its beam line
+    ok : array of bool, shape (n,)
+        False where the beam runs along the edge, which gives no constraint
+    """
+    c = np.cross(u, d)
+    norm = np.sqrt(np.sum(c * c, axis=-1))
+    ok = norm > 1e-9
+    c = c / np.where(ok, norm, 1)[:, np.newaxis]
+    w = q - a
+    b = np.sum(u * d, axis=-1)
+    t = (np.sum(d * w, axis=-1) - b * np.sum(u * w, axis=-1)) / np.where(ok, 1 - b * b, 1)
+    closest = a + t[:, np.newaxis] * d
+    return np.sum(w * c, axis=-1), c, closest, ok
+
+
+def fit_alignment(points, directions, sides, edges, A, origins, widths, iterations=20, tol=1e-12):
+    """
+    Jointly fit the holder offset and the basis and width of every side to
+    edge crossings
+
+    Each side is moved as a rigid body (translation, small rotation about
+    its origin) and its width may change, and the whole holder shares a
+    common translation, the offset. The residual of a crossing is the
+    distance between its beam line and its edge line, which is linear in
+    these parameters for small moves. All crossings are solved together in
+    one least-squares problem, repeated from the updated geometry until
+    the step is negligible.
+
+    Parameters
+    -----------
+    points : array, shape (n, 3)
+        A point on the beam line of each crossing, from beam_points
+    directions : array, shape (n, 3)
+        Beam direction of each crossing, from beam_directions
+    sides : array of int, shape (n,)
+        Zero-based side index of each crossing
+    edges : array of int, shape (n,)
+        Edge (0 or 1) of each crossing
+    A : array, shape (nsides, 3, 3)
+        Nominal basis matrices of the sides, in holder coordinates
+    origins : array, shape (nsides, 3)
+        Nominal side origins
+    widths : array, shape (nsides,)
+        Nominal side widths
+    iterations : int
+        Maximum number of linearized solves
+    tol : float
+        Stop once the largest parameter step is smaller than this
+
+    Returns
+    --------
+    offset : vector
+        Translation shared by all fitted sides. Each side's own
+        translation is what remains, and these sum to zero
+    p1, p2, p3 : arrays, shape (nsides, 3)
+        Points defining each fitted side, as for Panel. Edges along the
+        bar do not fix the origin along the bar, which stays nearest the
+        nominal one. Rows are nan for sides without at least one crossing
+        on each edge and three crossings overall
+    width : array, shape (nsides,)
+        Fitted distance between the edges
+    residuals : array, shape (n,)
+        Distance of each crossing's beam from its fitted edge
+    """
+    points = np.asarray(points, dtype=float)
+    directions = np.asarray(directions, dtype=float)
+    sides = np.asarray(sides, dtype=int)
+    edges = np.asarray(edges, dtype=int)
+    A = np.array(A, dtype=float)
+    origins = np.array(origins, dtype=float)
+    widths = np.array(widths, dtype=float)
+    nsides = len(origins)
+    n = len(points)
+    counts = np.bincount(2 * sides + edges, minlength=2 * nsides).reshape(nsides, 2)
+    valid = np.all(counts > 0, axis=-1) & (np.sum(counts, axis=-1) >= 3)
+    used = valid[sides]
+    rows = np.arange(n)
+    # Columns: common offset, then per side translation (3), rotation (3)
+    # and width change (1)
+    columns = 3 + 7 * sides
+    offset = np.zeros(3)
+    for _ in range(iterations):
+        n1 = A[sides, :, 0]
+        d = A[sides, :, 1]
+        a = origins[sides] + (edges * widths[sides])[:, np.newaxis] * n1
+        distance, c, closest, ok = _line_distances(points, directions, a, d)
+        fit = ok & used
+        J = np.zeros((n + 3, 3 + 7 * nsides))
+        rhs = np.zeros(n + 3)
+        J[:n, :3] = c
+        lever = np.cross(closest - origins[sides], c)
+        for k in range(3):
+            J[rows, columns + k] = c[:, k]
+            J[rows, columns + 3 + k] = lever[:, k]
+        J[rows, columns + 6] = edges * np.sum(n1 * c, axis=-1)
+        J[:n][~fit] = 0
+        rhs[:n] = np.where(fit, distance, 0)
+        # The offset and the side translations overlap; making the side
+        # translations sum to zero leaves the offset as their common part
+        for k in range(3):
+            J[n + k, 3 + k::7] = valid
+        step, *_ = np.linalg.lstsq(J, rhs, rcond=None)
+        offset += step[:3]
+        per_side = step[3:].reshape(nsides, 7)
+        for s in np.flatnonzero(valid):
+            omega = per_side[s, 3:6]
+            angle = np.sqrt(np.sum(omega * omega))
+            if angle > 0:
+                A[s] = np.dot(rotAxisMat(omega, angle), A[s])
+        origins[valid] += step[:3] + per_side[valid, :3]
+        widths[valid] += per_side[valid, 6]
+        if np.max(np.abs(step)) < tol:
+            break
+
+    p1 = origins.copy()
+    p2 = origins + A[:, :, 1]
+    p3 = origins + A[:, :, 0]
+    for p in (p1, p2, p3):
+        p[~valid] = np.nan
+    widths[~valid] = np.nan
+    residuals = edge_residuals(points, directions, sides, edges, p1, p2, p3, widths)
+    return offset, p1, p2, p3, widths, residuals
+
+
+def edge_residuals(points, directions, sides, edges, p1, p2, p3, width):
+    """
+    Distance from the beam line of each crossing to its fitted edge line
+
+    Parameters
+    -----------
+    points, directions, sides, edges :
+        As for fit_alignment
+    p1, p2, p3, width :
+        Fitted sides, as returned by fit_alignment
+
+    Returns
+    --------
+    residuals : array, shape (n,)
+        nan for crossings on sides that were not fit, or whose beam runs
+        along the edge
+    """
+    points = np.asarray(points, dtype=float)
+    directions = np.asarray(directions, dtype=float)
+    sides = np.asarray(sides, dtype=int)
+    edges = np.asarray(edges, dtype=int)
+    residuals = np.full(len(points), np.nan)
+    for n in np.unique(sides):
+        if np.any(np.isnan(p1[n])):
+            continue
+        A = changeBasisMatrix(*constructBasis(p1[n], p2[n], p3[n]))
+        mask = sides == n
+        a = p1[n] + (edges[mask] * width[n])[:, np.newaxis] * A[:, 0]
+        d = np.broadcast_to(A[:, 1], a.shape)
+        distance, _, _, ok = _line_distances(points[mask], directions[mask], a, d)
+        residuals[mask] = np.where(ok, np.abs(distance), np.nan)
+    return residuals
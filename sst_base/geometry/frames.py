@@ -1,7 +1,22 @@
 import numpy as np
 from .linalg import (vec, constructBasis, changeBasisMatrix, rad_to_deg,
-                     deg_to_rad, rotz, rotzMat)
-from .polygons import isInPoly, getMinDist
+                     deg_to_rad, rotz)
+from .polygons import (isInPoly, getMinDist, isInConvexPolys, getMinDists,
+                       isConvex, polygonDistance)
+
+
+def _any_array(*args):
+    return any(np.ndim(a) > 0 for a in args)
+
+
+def _pose_arrays(x, y, z, r):
+    """
+    Broadcast manipulator coordinates into an (n, 3) position array and
+    an (n,) rotation array, plus the broadcast shape for the results
+    """
+    x, y, z, r = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (x, y, z, r)])
+    manip = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=-1)
+    return manip, r.ravel(), x.shape
 
 
 class NullFrame:
@@ -13,13 +28,54 @@ class NullFrame:
 
     def distance_to_beam(self, *args):
         v = np.array(args)
-        return np.sqrt(np.dot(v, v))
+        return np.sqrt(np.sum(v*v, axis=0))
 
 
 class Axis:
+    """
+    One-dimensional frame. Transforms to and from the global frame are
+    composed into a single scale and offset, which are cached until an
+    axis in the parent chain is changed, so arrays of positions are
+    transformed in one step.
+    """
     def __init__(self, x0, scale=1, parent=None):
+        # Bumped whenever this axis changes. The cached composition is
+        # keyed on the revisions along the parent chain, so a change to a
+        # parent is seen by its children, and a change elsewhere is not.
+        self._revision = 0
+        self._composed = None
         self.reset(x0, scale, parent=parent)
 
+    def _changed(self):
+        self._revision += 1
+
+    @property
+    def x0(self):
+        return self._x0
+
+    @x0.setter
+    def x0(self, x0):
+        self._x0 = x0
+        self._changed()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, scale):
+        self._scale = scale
+        self._changed()
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        self._parent = parent
+        self._changed()
+
     def reset(self, x0, scale, parent=None):
         self.x0 = x0
         self.scale = scale
@@ -45,19 +101,38 @@ class Axis:
         else:
             self.parent.add_parent_frame(parent)
 
+    def _transforms(self):
+        """
+        Scale and offset of the composed frame to global and global to
+        frame transforms, as (scale, offset, inverse scale, inverse offset)
+        """
+        chain = []
+        frame = self
+        while frame is not None:
+            chain.append(frame)
+            frame = frame._parent
+        revisions = tuple(frame._revision for frame in chain)
+        if self._composed is None or self._composed[0] != revisions:
+            scale, offset = 1, 0
+            for frame in chain:
+                scale, offset = scale*frame.scale, offset*frame.scale + frame.x0
+            iscale, ioffset = 1, 0
+            for frame in chain[::-1]:
+                iscale, ioffset = iscale*frame.scale, ioffset*frame.scale - frame.x0
+            self._composed = (revisions, scale, offset, iscale, ioffset)
+        return self._composed[1:]
+
     def frame_to_global(self, x_frame):
-        x_parent = self.frame_to_parent(x_frame)
-        if self.parent is not None:
-            return self.parent.frame_to_global(x_parent)
-        else:
-            return x_parent
+        if _any_array(x_frame):
+            x_frame = np.asarray(x_frame, dtype=float)
+        scale, offset, _, _ = self._transforms()
+        return x_frame*scale + offset
 
     def global_to_frame(self, x_global):
-        if self.parent is None:
-            return self.parent_to_frame(x_global)
-        else:
-            x_parent = self.parent.global_to_frame(x_global)
-            return self.parent_to_frame(x_parent)
+        if _any_array(x_global):
+            x_global = np.asarray(x_global, dtype=float)
+        _, _, scale, offset = self._transforms()
+        return x_global*scale + offset
 
     def frame_to_beam(self, x_frame):
         return self.frame_to_global(x_frame)
@@ -71,7 +146,7 @@ class Axis:
 
         Parameters
         -----------
-        x_beam_global : float
+        x_beam_global : float or array
             beam position in global coordinate system
         """
         x = self.global_to_frame(x_beam_global)
@@ -85,13 +160,13 @@ class Interval(Axis):
 
     def frame_to_global(self, x, origin="edge"):
         if origin == "center":
-            x += self.length/2.0
+            x = x + self.length/2.0
         return super().frame_to_global(x)
 
     def global_to_frame(self, x, origin="edge"):
         x = super().global_to_frame(x)
         if origin == "center":
-            x -= self.length/2.0
+            x = x - self.length/2.0
         return x
 
     def frame_to_beam(self, x_frame, **kwargs):
@@ -101,19 +176,45 @@ class Interval(Axis):
         return self.global_to_frame(x_global, **kwargs)
 
     def distance_to_beam(self, x_beam_global):
+        """
+        Distance from the beam to the nearest end of the interval,
+        negative when the beam is inside
+
+        Parameters
+        -----------
+        x_beam_global : float or array
+            beam position in global coordinate system
+        """
         x = self.global_to_frame(x_beam_global)
         d1 = np.abs(x)
         d2 = np.abs(x - self.length)
-        if (d1 < self.length) and (d2 < self.length):
-            return -1*min(d1, d2)
-        else:
-            return min(d1, d2)
+        distance = np.minimum(d1, d2)
+        inside = (d1 < self.length) & (d2 < self.length)
+        return np.where(inside, -distance, distance)[()]
 
     def make_sample_frame(self, position, t=0):
         x1, x2 = position
         frame = Interval(x1, x2 - x1, parent=self)
         return frame
 
+    def add_samples(self, positions, t=0):
+        """
+        Create sample intervals for many positions at once
+
+        Parameters
+        -----------
+        positions : array, shape (n, 2)
+            x1, x2 of each sample, in interval coordinates
+        t : float or array, shape (n,)
+            Ignored, intervals have no thickness
+
+        Returns
+        --------
+        frames : list of Interval
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        return [self.make_sample_frame(position) for position in positions]
+
 
 class Frame:
     """
@@ -207,12 +308,72 @@ class Frame:
             return np.arctan(np.abs(x/y)) + np.pi*3/2.0
 
 
+    def _root_transform(self):
+        """
+        Composed basis matrix and offset that take frame coordinates into
+        the (unrotated) coordinates of the top-level frame.
+
+        The manipulator rotation is only ever applied at the top of the
+        hierarchy, so the chain of parents collapses to a single affine
+        transform, v_root = A.v + p0
+
+        Returns
+        --------
+        A, p0 : array, vector
+        """
+        if self.parent is None:
+            return self.A, self.p0
+        A, p0 = self.parent._root_transform()
+        return np.dot(A, self.A), np.dot(A, self.p0) + p0
+
     def _to_global(self, v):
         return np.dot(self.A, v) + self.p0
 
     def _to_frame(self, v):
         return np.dot(self.Ainv, v - self.p0)
 
+    def _frame_to_global_many(self, v_frame, manip, r):
+        """
+        Vectorized frame_to_global with rotation="global". All arguments
+        broadcast against each other.
+
+        Parameters
+        -----------
+        v_frame : array, shape (..., 3)
+            Points in the frame system
+        manip : array, shape (..., 3)
+            Manipulator positions
+        r : array, shape (...)
+            Manipulator rotations in degrees
+
+        Returns
+        --------
+        v_global : array, shape (..., 3)
+        """
+        A, p0 = self._root_transform()
+        v_root = np.dot(v_frame, A.T) + p0
+        theta = deg_to_rad(np.asarray(r, dtype=float))
+        return rotz(-theta, v_root) + manip
+
+    def _global_to_frame_many(self, v_global, manip, r, direction=False):
+        """
+        Vectorized global_to_frame. All arguments broadcast against each
+        other. If direction is True, v_global is a direction, and neither
+        the manipulator position nor the frame origin are applied.
+
+        Returns
+        --------
+        v_frame : array, shape (..., 3)
+        """
+        A, p0 = self._root_transform()
+        if not direction:
+            v_global = v_global - manip
+        theta = deg_to_rad(np.asarray(r, dtype=float))
+        v_root = rotz(theta, v_global)
+        if not direction:
+            v_root = v_root - p0
+        return np.dot(v_root, A)
+
     def _manip_to_global(self, v_manip, manip, r):
         theta = deg_to_rad(r)
         v_global = rotz(-theta, v_manip) + manip
@@ -283,8 +444,15 @@ class Frame:
         --------
         coordinates : tuple
             The x, y, z, r coordinates of the manipulator that put the
-            frame coordinate into the beam path
+            frame coordinate into the beam path. Arrays if any of the
+            frame coordinates are arrays
         """
+        if _any_array(fx, fy, fz, fr):
+            v_frame, fr, shape = _pose_arrays(fx, fy, fz, fr)
+            gr = fr + self.r0
+            v_global = -1*self._frame_to_global_many(v_frame, 0, gr)
+            gx, gy, gz = (v_global[:, i].reshape(shape) for i in range(3))
+            return gx, gy, gz, gr.reshape(shape)
 
         v_frame = vec(fx, fy, fz)
         v_global = -1*self.frame_to_global(v_frame, r=fr)
@@ -312,8 +480,15 @@ class Frame:
         Returns
         --------
         coordinates : tuple
-            The x, y, z, r coordinates of the beam in the frame system
+            The x, y, z, r coordinates of the beam in the frame system.
+            Arrays if any of the manipulator coordinates are arrays
         """
+        if _any_array(gx, gy, gz, gr):
+            manip, gr, shape = _pose_arrays(gx, gy, gz, gr)
+            v_frame = self._global_to_frame_many(np.zeros(3), manip, gr)
+            fx, fy, fz = (v_frame[:, i].reshape(shape) for i in range(3))
+            return fx, fy, fz, (gr - self.r0).reshape(shape)
+
         manip = vec(gx, gy, gz)
         v_frame = self.origin_to_frame(manip, gr)
         fx, fy, fz = (v_frame[0], v_frame[1], v_frame[2])
@@ -326,12 +501,49 @@ class Frame:
     def project_beam_to_frame_xy(self, manip=vec(0, 0, 0), r=0):
         op = self.origin_to_frame(manip, r)
         theta = deg_to_rad(r)
-        Rz_inv = rotzMat(-theta)
-        vp = np.dot(self.Ainv, np.dot(Rz_inv, vec(0, 1, 0)))
+        vp = np.dot(self.Ainv, rotz(-theta, vec(0, 1, 0)))
         a = op[-1]/vp[-1]
         proj = op - a*vp
         return proj
 
+    def beam_footprint(self, gx, gy, gz, gr, beam_size, divergence=(0, 0)):
+        """
+        Illuminated area of the frame x-y plane, for one or many
+        manipulator positions
+
+        Parameters
+        ------------
+        gx, gy, gz : float or array
+            manipulator coordinates
+        gr : float or array, degrees
+            manipulator r coordinate
+        beam_size : tuple
+            Full width of the beam along global x and z at the beam origin
+        divergence : tuple
+            Full divergence angles of the beam along global x and z, radians
+
+        Returns
+        --------
+        footprint : array, shape (..., 4, 2)
+            Vertices of the illuminated quadrilateral in frame x, y.
+            Infinite or nan when the beam runs parallel to the frame
+        """
+        manip, r, shape = _pose_arrays(gx, gy, gz, gr)
+        w, h = beam_size
+        tx, tz = np.tan(np.asarray(divergence, dtype=float)/2.0)
+        sx = np.array([-1, 1, 1, -1])
+        sz = np.array([-1, -1, 1, 1])
+        origins = np.stack([sx*w/2.0, 0*sx, sz*h/2.0], axis=-1)
+        directions = np.stack([sx*tx, 1 + 0*sx, sz*tz], axis=-1)
+        manip = manip[:, np.newaxis, :]
+        r = r[:, np.newaxis]
+        o = self._global_to_frame_many(origins, manip, r)
+        d = self._global_to_frame_many(directions, manip, r, direction=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            a = o[..., 2]/d[..., 2]
+            proj = o[..., :2] - a[..., np.newaxis]*d[..., :2]
+        return proj.reshape(shape + (4, 2))
+
     def distance_to_beam(self, gx, gy, gz, gr=0):
         """
         Given the manipulator coordinate (and rotation, for consistency),
@@ -354,6 +566,10 @@ class Frame:
         distance : float
             Distance from the global y-axis (the beam) to the coordinate origin
         """
+        if _any_array(gx, gy, gz, gr):
+            manip, r, shape = _pose_arrays(gx, gy, gz, gr)
+            op = self._frame_to_global_many(vec(0, 0, 0), manip, r + self.r0)
+            return np.sqrt(op[:, 0]**2 + op[:, 2]**2).reshape(shape)
         op = self.frame_to_global(vec(0, 0, 0), manip=vec(gx, gy, gz), r=gr)
         distance = np.sqrt(op[0]**2 + op[2]**2)
         return distance
@@ -361,7 +577,8 @@ class Frame:
 
 class Panel(Frame):
     """
-    A frame that has boundaries, making it a rectangle
+    A frame that has boundaries, making it a rectangle, or any polygon
+    (with cut-outs) in the frame x-y plane
 
     Parameters
     ------------
@@ -372,26 +589,57 @@ class Panel(Frame):
     p3 : vector
         defines the plane of the x basis vector
     parent : Frame, optional
+    outline : sequence of (x, y), optional
+        Boundary of the panel in frame coordinates. Defaults to the
+        width x height rectangle
+    holes : sequence of outlines, optional
+        Cut-outs or windows in the panel, in frame coordinates
 
     """
-    def __init__(self, *args, width=19.5, height=130, parent=None):
+    def __init__(self, *args, width=19.5, height=130, parent=None,
+                 outline=None, holes=None):
         super().__init__(*args, parent=parent)
         self.width = width
         self.height = height
-        self.edges = [vec(0, 0, 0), vec(width, 0, 0), vec(width, height, 0),
-                      vec(0, height, 0)]
+        self._rectangle = outline is None
+        if outline is None:
+            self.edges = [vec(0, 0, 0), vec(width, 0, 0),
+                          vec(width, height, 0), vec(0, height, 0)]
+        else:
+            self.edges = [vec(x, y, 0) for x, y in outline]
+        if holes is None:
+            holes = []
+        self.holes = [[vec(x, y, 0) for x, y in hole] for hole in holes]
+        self._convex = (len(self.holes) == 0 and
+                        isConvex([e[:2] for e in self.edges]))
+
+    def set_width(self, width):
+        """
+        Change the width of a panel with the default rectangular outline,
+        which moves its x = width edge
+
+        Parameters
+        -----------
+        width : float
+        """
+        if not self._rectangle:
+            raise ValueError("Only panels with the default rectangular outline can change width")
+        height = self.height
+        self.width = width
+        self.edges = [vec(0, 0, 0), vec(width, 0, 0),
+                      vec(width, height, 0), vec(0, height, 0)]
 
     def frame_to_beam(self, fx, fy, fz, fr=0, origin="edge"):
         if origin == "center":
-            fx += self.width/2.0
-            fy += self.height/2.0
+            fx = fx + self.width/2.0
+            fy = fy + self.height/2.0
         return super().frame_to_beam(fx, fy, fz, fr)
 
     def beam_to_frame(self, gx, gy, gz, gr=0, origin="edge"):
         fx, fy, fz, fr = super().beam_to_frame(gx, gy, gz, gr)
         if origin == "center":
-            fx -= self.width/2.0
-            fy -= self.height/2.0
+            fx = fx - self.width/2.0
+            fy = fy - self.height/2.0
         return fx, fy, fz, fr
 
     def real_edges(self, manip, r_manip):
@@ -438,6 +686,26 @@ class Panel(Frame):
             ret.append(np.array([edge[0], edge[2]]))
         return ret
 
+    def project_real_edges_many(self, manip, r_manip):
+        """
+        Vectorized project_real_edges
+
+        Parameters
+        ------------
+        manip : array, shape (n, 3)
+            Manipulator x,y,z positions
+        r_manip : array, shape (n,)
+            Manipulator rotations in degrees
+
+        Returns
+        --------
+        Vertex coordinates projected into the x-z axis, shape (n, 4, 2)
+        """
+        manip = np.asarray(manip, dtype=float)[:, np.newaxis, :]
+        r_manip = np.asarray(r_manip, dtype=float)[:, np.newaxis]
+        re = self._frame_to_global_many(np.array(self.edges), manip, r_manip)
+        return re[..., ::2]
+
     def distance_to_beam(self, x, y, z, r):
         """
         Returns the distance from the beam to the closest edge of
@@ -461,6 +729,15 @@ class Panel(Frame):
             and positive if the beam is outside the Panel
         """
 
+        if not self._convex:
+            return self._polygon_distance_to_beam(x, y, z, r)
+        if _any_array(x, y, z, r):
+            manip, r, shape = _pose_arrays(x, y, z, r)
+            polys = self.project_real_edges_many(manip, r)
+            origin = vec(0, 0)
+            inPoly = isInConvexPolys(origin, polys)
+            distance = getMinDists(origin, polys)
+            return np.where(inPoly, -1*distance, distance).reshape(shape)
         manip = vec(x, y, z)
         real_edges = self.project_real_edges(manip, r)
         inPoly = isInPoly(vec(0, 0), *real_edges)
@@ -470,18 +747,257 @@ class Panel(Frame):
         else:
             return distance
 
+    def _polygon_distance_to_beam(self, x, y, z, r):
+        """
+        distance_to_beam for non-convex panels and panels with holes,
+        using a winding number test
+        """
+        manip, r, shape = _pose_arrays(x, y, z, r)
+        outline = self.project_real_edges_many(manip, r)
+        holes = [self._frame_to_global_many(np.array(hole), manip[:, np.newaxis],
+                                            r[:, np.newaxis])[..., ::2]
+                 for hole in self.holes]
+        distance = polygonDistance(vec(0, 0), outline, holes).reshape(shape)
+        return distance[()]
+
+    @property
+    def sample_store(self):
+        """
+        Compact storage for the sample rectangles on this panel, created
+        on first use
+        """
+        store = self.__dict__.get("_sample_store", None)
+        if store is None:
+            store = SampleStore(self)
+            self.__dict__["_sample_store"] = store
+        return store
+
+    def clear_samples(self):
+        """
+        Start a new, empty sample store. Frames that were already handed
+        out keep a reference to the old store, so they stay valid.
+        """
+        self.__dict__.pop("_sample_store", None)
+
     def make_sample_frame(self, position, t=0):
         if len(position) == 4:
-            x1, y1, x2, y2 = position
-            p1 = vec(x1, y1, t)
-            p2 = vec(x1, y2, t)
-            p3 = vec(x2, y1, t)
-            width = x2 - x1
-            height = y2 - y1
-
-            frame = Panel(p1, p2, p3, height=height, width=width,
-                          parent=self)
-            return frame
+            return self.add_samples([position], t)[0]
+
+    def add_samples(self, positions, t=0):
+        """
+        Create sample frames for many rectangles on the panel at once
+
+        Parameters
+        -----------
+        positions : array, shape (n, 4)
+            x1, y1, x2, y2 of each sample, in panel coordinates
+        t : float or array, shape (n,)
+            thickness of each sample
+
+        Returns
+        --------
+        frames : list of SampleFrame
+        """
+        return self.sample_store.extend(positions, t)
+
+
+class SampleStore:
+    """
+    Sample rectangles on a Panel, held in contiguous arrays. Sample frames
+    are axis-aligned with the panel, so a rectangle is fully described by
+    its origin (x1, y1, thickness) and signed extents (x2 - x1, y2 - y1).
+    The basis matrix of each row is written alongside it, so that frame
+    transforms only have to index it.
+
+    A row can be given an arbitrary basis with set_basis, after which its
+    rotation offset is held in rotations instead of following the parent.
+
+    Each SampleFrame view keeps plain references to its rows, so that
+    transforms do not go through the store. The store refreshes them
+    whenever it reallocates its arrays or changes a row's basis.
+    """
+    def __init__(self, parent, capacity=16):
+        self.parent = parent
+        self.size = 0
+        self.origin = np.zeros((capacity, 3))
+        self.extent = np.zeros((capacity, 2))
+        self.A = np.zeros((capacity, 3, 3))
+        self.rotations = {}
+        self.views = []
+
+    @property
+    def thickness(self):
+        return self.origin[:self.size, 2]
+
+    def _reserve(self, n):
+        capacity = len(self.origin)
+        if self.size + n <= capacity:
+            return
+        capacity = max(2*capacity, self.size + n)
+        origin = np.zeros((capacity, 3))
+        extent = np.zeros((capacity, 2))
+        A = np.zeros((capacity, 3, 3))
+        origin[:self.size] = self.origin[:self.size]
+        extent[:self.size] = self.extent[:self.size]
+        A[:self.size] = self.A[:self.size]
+        self.origin = origin
+        self.extent = extent
+        self.A = A
+        for view in self.views:
+            view._load()
+
+    def _write_bases(self, start, stop):
+        """
+        Diagonal basis matrices of rows start:stop, with the signs of
+        their extents
+        """
+        sx, sy = np.sign(self.extent[start:stop]).T
+        A = self.A[start:stop]
+        A[:] = 0
+        A[:, 0, 0] = sx
+        A[:, 1, 1] = sy
+        A[:, 2, 2] = sx*sy
+
+    def extend(self, positions, t=0):
+        """
+        Add rectangles and return a SampleFrame view for each
+
+        Parameters
+        -----------
+        positions : array, shape (n, 4)
+            x1, y1, x2, y2 of each sample
+        t : float or array, shape (n,)
+            thickness of each sample
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 4)
+        n = len(positions)
+        self._reserve(n)
+        start = self.size
+        stop = start + n
+        self.origin[start:stop, :2] = positions[:, :2]
+        self.origin[start:stop, 2] = t
+        self.extent[start:stop] = positions[:, 2:] - positions[:, :2]
+        self._write_bases(start, stop)
+        self.size = stop
+        views = [SampleFrame(self, i) for i in range(start, stop)]
+        self.views.extend(views)
+        return views
+
+    def adopt(self, origin, extent):
+        """
+        Replace the contents of the store with existing arrays, without
+        copying them, and return a SampleFrame view for each row
+
+        Parameters
+        -----------
+        origin : array, shape (n, 3)
+            x1, y1, thickness of each sample
+        extent : array, shape (n, 2)
+            x2 - x1, y2 - y1 of each sample
+        """
+        self.origin = origin
+        self.extent = extent
+        self.size = len(origin)
+        self.A = np.zeros((self.size, 3, 3))
+        self.rotations = {}
+        self._write_bases(0, self.size)
+        # Views of the replaced rows keep the arrays they were made with
+        self.views = [SampleFrame(self, i) for i in range(self.size)]
+        return list(self.views)
+
+    def set_basis(self, index, p1, p2, p3):
+        """
+        Move one row to the basis defined by three points, as
+        Frame.update_basis does. The extents are kept.
+
+        Parameters
+        -----------
+        index : int
+            Row of the store
+        p1, p2, p3 : vector
+            Points that define the basis, in the parent frame
+        """
+        self.origin[index] = p1
+        self.A[index] = changeBasisMatrix(*constructBasis(p1, p2, p3))
+        self.rotations[index] = None
+        self.views[index]._load()
+
+
+class SampleFrame(Panel):
+    """
+    View of one rectangle in a SampleStore, which behaves as the Panel
+    that make_sample_frame used to create. The geometry lives in the
+    store arrays; the frame holds views of its rows, which the store
+    keeps current.
+
+    The basis is diagonal in the parent frame, with signs set by the
+    signs of the extents, and the rotation offset follows the parent,
+    until update_basis gives the frame a basis of its own.
+    """
+    rot_meas_axis = 2
+    holes = ()
+    _convex = True
+    _rectangle = False
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+        self.parent = store.parent
+        self._load()
+
+    def _load(self):
+        """
+        Take views of the store rows, after they were moved or changed
+        """
+        store = self._store
+        index = self._index
+        self.p0 = store.origin[index]
+        self.A = store.A[index]
+        self.Ainv = self.A.T
+        self.width, self.height = store.extent[index]
+        self._r0 = store.rotations.get(index, None)
+        self._flipped = self.A[2, 2] < 0
+
+    @property
+    def _basis(self):
+        return tuple(self.A.T)
+
+    @property
+    def vectors(self):
+        A = self.A
+        p1 = self.p0.copy()
+        return [p1, p1 + A[:, 1], p1 + A[:, 0]]
+
+    @property
+    def edges(self):
+        width = self.width
+        height = self.height
+        return [vec(0, 0, 0), vec(width, 0, 0), vec(width, height, 0),
+                vec(0, height, 0)]
+
+    @property
+    def axis_aligned(self):
+        return self._index not in self._store.rotations
+
+    @property
+    def r0(self):
+        if self._r0 is not None:
+            return self._r0
+        if self._flipped:
+            return (self.parent.r0 + 180.0) % 360.0
+        return self.parent.r0
+
+    def update_rotation(self):
+        """
+        The rotation offset of an axis-aligned frame is derived from the
+        parent, so only frames with their own basis store it
+        """
+        if not self.axis_aligned:
+            self._r0 = self._store.rotations[self._index] = rad_to_deg(self._roffset())
+
+    def update_basis(self, p1, p2, p3):
+        self._store.set_basis(self._index, p1, p2, p3)
+        self.update_rotation()
 
 
 def make_geometry(*args, **kwargs):
@@ -1,3 +1,5 @@
+import math
+from functools import lru_cache
 import numpy as np
 
 """
@@ -87,47 +89,128 @@ def constructBorders(p1, p2, p3, sidelength=1):
     return borders
 
 
+@lru_cache(maxsize=256)
+def _cossin(theta):
+    return math.cos(theta), math.sin(theta)
+
+
+def cossin(theta):
+    """
+    Cosine and sine of theta. Scalar angles go through a small cache, as
+    the same few angles (grazing, normal, fixed incidence) recur in most
+    scans.
+
+    Parameters
+    -----------
+    theta : float or array, radians
+    """
+    if isinstance(theta, (float, int, np.number)) or np.ndim(theta) == 0:
+        return _cossin(float(theta))
+    theta = np.asarray(theta, dtype="float64")
+    return np.cos(theta), np.sin(theta)
+
+
+def _rotMat(theta, i, j):
+    """
+    Rotation matrix (or stack of matrices, with shape theta.shape + (3, 3))
+    that rotates the i axis towards the j axis
+    """
+    c, s = cossin(theta)
+    m = np.zeros(np.shape(c) + (3, 3))
+    k = 3 - i - j
+    m[..., k, k] = 1
+    m[..., i, i] = c
+    m[..., j, j] = c
+    m[..., j, i] = s
+    m[..., i, j] = -s
+    return m
+
+
 def rotzMat(theta):
     """
     Parameters
     -----------
-    theta : float, radians
+    theta : float or array, radians
+        If theta is an array, a stack of matrices with shape
+        theta.shape + (3, 3) is returned
     """
-    return np.array([[np.cos(theta), -np.sin(theta), 0],
-                     [np.sin(theta),  np.cos(theta), 0],
-                     [0, 0, 1]])
+    return _rotMat(theta, 0, 1)
 
 
 def rotyMat(theta):
-    return np.array([[np.cos(theta), 0, np.sin(theta)],
-                     [0, 1, 0],
-                     [-np.sin(theta), 0,  np.cos(theta)]
-                     ])
+    return _rotMat(theta, 2, 0)
 
 
 def rotxMat(theta):
-    return np.array([[1, 0, 0],
-                     [0, np.cos(theta), -np.sin(theta)],
-                     [0, np.sin(theta), np.cos(theta)]
-                     ])
+    return _rotMat(theta, 1, 2)
+
+
+def rotAxisMat(axis, theta):
+    """
+    Rotation matrix for a right-handed rotation of theta around axis
+
+    Parameters
+    -----------
+    axis : vector
+        rotation axis, need not be normalized
+    theta : float or array, radians
+        If theta is an array, a stack of matrices with shape
+        theta.shape + (3, 3) is returned
+    """
+    u = normVector(axis)
+    theta = np.asarray(theta, dtype="float64")
+    c = np.cos(theta)[..., np.newaxis, np.newaxis]
+    s = np.sin(theta)[..., np.newaxis, np.newaxis]
+    ux = np.array([[0, -u[2], u[1]],
+                   [u[2], 0, -u[0]],
+                   [-u[1], u[0], 0]])
+    return c*np.eye(3) + s*ux + (1 - c)*np.outer(u, u)
+
+
+def _rot(theta, v, i, j):
+    """
+    Rotate v by theta in the plane that takes the i axis towards the j
+    axis, without building matrices. theta, with shape T, and v, with
+    shape V + (3,), are broadcast against each other
+    """
+    c, s = cossin(theta)
+    if isinstance(c, float) and np.shape(v) == (3,):
+        # Single vector, plain float arithmetic is much cheaper than
+        # numpy on three elements
+        out = v.tolist() if isinstance(v, np.ndarray) else [float(x) for x in v]
+        vi, vj = out[i], out[j]
+        out[i] = c*vi - s*vj
+        out[j] = s*vi + c*vj
+        return np.array(out)
+    v = np.asarray(v, dtype="float64")
+    vi, vj = v[..., i], v[..., j]
+    out = np.empty(np.broadcast_shapes(np.shape(c), vi.shape) + (3,))
+    out[..., i] = c*vi - s*vj
+    out[..., j] = s*vi + c*vj
+    k = 3 - i - j
+    out[..., k] = v[..., k]
+    return out
 
 
 def rotz(theta, v):
     """
     Rotate a vector by theta around the z axis
+
+    Parameters
+    -----------
+    theta : float or array, radians
+    v : vector or array of vectors, shape (..., 3)
+        Broadcast against theta
     """
-    rz = rotzMat(theta)
-    return np.dot(rz, v)
+    return _rot(theta, v, 0, 1)
 
 
 def roty(theta, v):
-    ry = rotyMat(theta)
-    return np.dot(ry, v)
+    return _rot(theta, v, 2, 0)
 
 
 def rotx(theta, v):
-    rx = rotxMat(theta)
-    return np.dot(rx, v)
+    return _rot(theta, v, 1, 2)
 
 
 def deg_to_rad(d):
@@ -50,7 +50,257 @@ def prunePoints(*args):
 
 
 def isInPoly(p, *args):
-    # Works for convex polygons only!
+    # Works for convex polygons only! See isInPolygon for the general case
     polyPoints = prunePoints(*args)
     areas = np.array(getPointAreas(p, *polyPoints))
     return (np.all(areas < 0) or np.all(areas > 0))
+
+
+def _edge_vectors(polys):
+    """
+    Start and end vertices of every edge of a batch of polygons
+    """
+    start = np.roll(polys, 1, axis=-2)
+    return start, polys
+
+
+def triareas(p, polys):
+    """
+    Vectorized getPointAreas for many points and polygons
+
+    Parameters
+    -----------
+    p : array, shape (..., 2)
+        Points
+    polys : array, shape (..., m, 2)
+        Polygon vertices, broadcast against p
+
+    Returns
+    --------
+    areas : array, shape (..., m)
+    """
+    a, b = _edge_vectors(polys)
+    p = np.asarray(p)[..., np.newaxis, :]
+    n1 = p - a
+    n2 = b - a
+    return 0.5*(n1[..., 0]*n2[..., 1] - n1[..., 1]*n2[..., 0])
+
+
+def isInConvexPolys(p, polys):
+    """
+    Vectorized isInPoly for many points and (convex) polygons.
+    Zero-length edges are ignored, as prunePoints does.
+    """
+    a, b = _edge_vectors(polys)
+    valid = ~np.all(np.isclose(b - a, 0.0), axis=-1)
+    areas = triareas(p, polys)
+    pos = np.all((areas > 0) | ~valid, axis=-1)
+    neg = np.all((areas < 0) | ~valid, axis=-1)
+    return (pos | neg) & np.any(valid, axis=-1)
+
+
+def getMinDists(p, polys):
+    """
+    Vectorized getMinDist: distance from each point to the nearest edge
+    of its polygon
+    """
+    a, b = _edge_vectors(polys)
+    p = np.asarray(p)[..., np.newaxis, :]
+    ab = b - a
+    ap = p - a
+    length2 = np.sum(ab*ab, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.clip(np.sum(ap*ab, axis=-1)/length2, 0, 1)
+    t = np.where(length2 > 0, t, 0)
+    closest = a + t[..., np.newaxis]*ab
+    d = np.sqrt(np.sum((p - closest)**2, axis=-1))
+    return np.min(d, axis=-1)
+
+
+def isConvex(vertices):
+    """
+    True if the polygon is convex (zero-length edges are ignored)
+
+    Parameters
+    -----------
+    vertices : array, shape (m, 2)
+    """
+    vertices = np.asarray(prunePoints(*np.asarray(vertices, dtype=float)))
+    if len(vertices) < 3:
+        return False
+    a = vertices - np.roll(vertices, 1, axis=0)
+    b = np.roll(a, -1, axis=0)
+    cross = a[:, 0]*b[:, 1] - a[:, 1]*b[:, 0]
+    cross = cross[~np.isclose(cross, 0)]
+    return bool(np.all(cross > 0) or np.all(cross < 0))
+
+
+def windingNumbers(p, polys):
+    """
+    Vectorized winding number of points with respect to closed polygons.
+    Works for any simple or self-intersecting polygon, convex or not.
+
+    Parameters
+    -----------
+    p : array, shape (..., 2)
+        Points
+    polys : array, shape (..., m, 2)
+        Polygon vertices, broadcast against p
+
+    Returns
+    --------
+    winding : int array, shape (...)
+        Zero for points outside the polygon
+    """
+    a, b = _edge_vectors(np.asarray(polys, dtype=float))
+    p = np.asarray(p, dtype=float)[..., np.newaxis, :]
+    isLeft = ((b[..., 0] - a[..., 0])*(p[..., 1] - a[..., 1]) -
+              (p[..., 0] - a[..., 0])*(b[..., 1] - a[..., 1]))
+    below = a[..., 1] <= p[..., 1]
+    up = below & (b[..., 1] > p[..., 1]) & (isLeft > 0)
+    down = ~below & (b[..., 1] <= p[..., 1]) & (isLeft < 0)
+    return np.sum(up, axis=-1) - np.sum(down, axis=-1)
+
+
+def isInPolygon(p, outline, holes=()):
+    """
+    Vectorized inclusion test for general polygons with holes. Points on
+    a hole count as outside. Convex polygons without holes use the same
+    test as isInPoly.
+
+    Parameters
+    -----------
+    p : array, shape (..., 2)
+        Points
+    outline : array, shape (..., m, 2)
+        Outer boundary, broadcast against p
+    holes : sequence of arrays, shape (..., k, 2)
+        Boundaries of cut-outs
+    """
+    outline = np.asarray(outline, dtype=float)
+    if len(holes) == 0 and outline.ndim == 2 and isConvex(outline):
+        return isInConvexPolys(p, outline)
+    inside = windingNumbers(p, outline) != 0
+    for hole in holes:
+        inside &= windingNumbers(p, hole) == 0
+    return inside
+
+
+def polygonDistance(p, outline, holes=()):
+    """
+    Vectorized signed distance from points to the nearest boundary of a
+    polygon with holes; negative inside the polygon
+
+    Parameters
+    -----------
+    p : array, shape (..., 2)
+        Points
+    outline : array, shape (..., m, 2)
+        Outer boundary, broadcast against p
+    holes : sequence of arrays, shape (..., k, 2)
+        Boundaries of cut-outs
+    """
+    distance = getMinDists(p, outline)
+    for hole in holes:
+        distance = np.minimum(distance, getMinDists(p, hole))
+    inside = isInPolygon(p, outline, holes)
+    return np.where(inside, -1*distance, distance)
+
+
+def polygonAreas(polys):
+    """
+    Vectorized (unsigned) shoelace area of polygons
+
+    Parameters
+    -----------
+    polys : array, shape (..., m, 2)
+    """
+    a, b = _edge_vectors(np.asarray(polys, dtype=float))
+    return 0.5*np.abs(np.sum(a[..., 0]*b[..., 1] - b[..., 0]*a[..., 1], axis=-1))
+
+
+def _cross2(u, v):
+    return u[..., 0]*v[..., 1] - u[..., 1]*v[..., 0]
+
+
+def clipPolygons(polys, clip):
+    """
+    Vectorized Sutherland-Hodgman clipping of many polygons by convex
+    polygons. The polygons being clipped may be non-convex; the result
+    then has zero-width bridges, which leave its area unchanged.
+
+    After each clipping edge the vertices are compacted, and unused slots
+    repeat the previous vertex, which leaves areas and boundaries
+    unchanged, so results for all polygons share one array shape no
+    larger than the longest clipped polygon needs.
+
+    Parameters
+    -----------
+    polys : array, shape (..., k, 2)
+        Polygons to clip
+    clip : array, shape (..., m, 2)
+        Convex clipping polygons, broadcast against polys
+
+    Returns
+    --------
+    clipped : array, shape (..., j, 2)
+        Clipped polygons; polygons that lie entirely outside the clip
+        polygon collapse to a single repeated point with zero area
+    """
+    polys = np.asarray(polys, dtype=float)
+    clip = np.asarray(clip, dtype=float)
+    batch = np.broadcast_shapes(polys.shape[:-2], clip.shape[:-2])
+    out = np.broadcast_to(polys, batch + polys.shape[-2:])
+    clip = np.broadcast_to(clip, batch + clip.shape[-2:])
+    ca, cb = _edge_vectors(clip)
+    edges = cb - ca
+    turns = _cross2(edges, np.roll(edges, -1, axis=-2))
+    turns = np.where(np.isclose(turns, 0), 0, turns)
+    if np.any(np.any(turns > 0, axis=-1) & np.any(turns < 0, axis=-1)):
+        raise ValueError("Clipping polygons must be convex")
+    orientation = np.sign(np.sum(_cross2(ca, cb), axis=-1))[..., np.newaxis]
+    for i in range(clip.shape[-2]):
+        a = ca[..., i:i + 1, :]
+        edge = edges[..., i:i + 1, :]
+        E = out
+        S = np.roll(out, 1, axis=-2)
+        e_in = orientation*_cross2(edge, E - a) >= 0
+        s_in = orientation*_cross2(edge, S - a) >= 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = -_cross2(edge, S - a)/_cross2(edge, E - S)
+            intersection = S + t[..., np.newaxis]*(E - S)
+        crossing = (e_in != s_in) & np.isfinite(t)
+        new = np.stack([intersection, E], axis=-2)
+        valid = np.stack([crossing, e_in], axis=-1)
+        shape = out.shape[:-2] + (2*out.shape[-2],)
+        out = _compact(new.reshape(shape + (2,)), valid.reshape(shape))
+    return out
+
+
+def _compact(points, valid):
+    """
+    Move the valid vertices of each polygon to the front, in order, and
+    drop the slots that no polygon uses
+    """
+    keep = max(int(np.max(np.sum(valid, axis=-1), initial=0)), 1)
+    order = np.argsort(~valid, axis=-1, kind="stable")[..., :keep]
+    points = np.take_along_axis(points, order[..., np.newaxis], axis=-2)
+    valid = np.take_along_axis(valid, order, axis=-1)
+    return _fill_invalid(points, valid)
+
+
+def _fill_invalid(points, valid):
+    """
+    Replace invalid vertices with the closest preceding valid vertex,
+    wrapping around the polygon
+    """
+    n = points.shape[-2]
+    idx = np.where(valid, np.arange(n), -1)
+    idx = np.maximum.accumulate(idx, axis=-1)
+    last = idx[..., -1:]
+    idx = np.where(idx < 0, last, idx)
+    idx = np.where(idx < 0, 0, idx)
+    filled = np.take_along_axis(points, idx[..., np.newaxis], axis=-2)
+    empty = ~np.any(valid, axis=-1)
+    filled[empty] = 0
+    return filled
@@ -1,9 +1,117 @@
 import numpy as np
 from ophyd import Device, Signal, Component as Cpt
 from ophyd.status import StatusBase
-from .geometry.frames import Panel, Interval, NullFrame
-from .geometry.linalg import vec, deg_to_rad
-import copy
+from .geometry.frames import Frame, Panel, Interval, NullFrame
+from .geometry.linalg import vec, deg_to_rad, constructBasis, rotAxisMat, rotz
+from .geometry.polygons import polygonAreas, clipPolygons
+from .geometry.alignment import beam_points, beam_directions, fit_alignment
+from .snapshot import save_snapshot, load_snapshot
+from collections.abc import Mapping
+from types import MappingProxyType
+import itertools
+
+
+_md_versions = itertools.count(1)
+
+
+class _FrozenList(tuple):
+    """
+    Read-only stand-in for a list, so that thawing gives a list back
+    """
+
+
+def _freeze(value):
+    if isinstance(value, SampleMetadata):
+        return value
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return _FrozenList(_freeze(v) for v in value)
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        value.flags.writeable = False
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, _FrozenList):
+        return [_thaw(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_thaw(v) for v in value)
+    if isinstance(value, frozenset):
+        return set(value)
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    return value
+
+
+class SampleMetadata(Mapping):
+    """
+    Read-only sample metadata record. Nested dicts and lists are frozen
+    once, when the record is made, so the record can be handed out and
+    held without copying.
+
+    Every record gets a new, globally increasing version number, so
+    callers that cache values derived from the metadata only need to
+    compare versions. Use replace() to get an updated record, and
+    to_dict() for plain dicts and lists that can be serialized.
+    """
+
+    __slots__ = ("_data", "_version")
+
+    def __init__(self, data=(), **kwargs):
+        _data = dict(data)
+        _data.update(kwargs)
+        object.__setattr__(self, "_data", {k: _freeze(v) for k, v in _data.items()})
+        object.__setattr__(self, "_version", next(_md_versions))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SampleMetadata is read-only, use replace()")
+
+    @property
+    def version(self):
+        return self._version
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"SampleMetadata({self.to_dict()!r}, version={self._version})"
+
+    def __reduce__(self):
+        # Pickles and deep copies are made from plain data, and get a new
+        # version
+        return (SampleMetadata, (self.to_dict(),))
+
+    def replace(self, **kwargs):
+        """
+        Return a new record with the given keys changed. Unchanged values
+        are shared with this record.
+        """
+        new = SampleMetadata.__new__(SampleMetadata)
+        data = dict(self._data)
+        data.update({k: _freeze(v) for k, v in kwargs.items()})
+        object.__setattr__(new, "_data", data)
+        object.__setattr__(new, "_version", next(_md_versions))
+        return new
+
+    def to_dict(self):
+        """
+        Mutable deep copy of the metadata, as plain dicts and lists
+        """
+        return _thaw(self._data)
 
 
 class Sample(Device):
@@ -14,14 +122,16 @@ class Sample(Device):
     origin = Cpt(Signal, value="")
 
     def set(self, md):
-        self.sample_name.set(md["name"]).wait()
-        self.sample_id.set(md["sample_id"]).wait()
-        self.sample_desc.set(md["description"]).wait()
-        self.side.set(md["side"]).wait()
+        # Soft signals update synchronously on put, so there is no need to
+        # go through set(), which starts a thread for every signal
+        self.sample_name.put(md["name"])
+        self.sample_id.put(md["sample_id"])
+        self.sample_desc.put(md["description"])
+        self.side.put(md["side"])
         if md.get("origin", None) is None:
             self.origin.kind = "omitted"
         else:
-            self.origin.set(md["origin"]).wait()
+            self.origin.put(md["origin"])
             self.origin.kind = "normal"
         status = StatusBase()
         status.set_finished()
@@ -54,7 +164,32 @@ def make_two_sided_bar(width, height, thickness=0, parent=None):
 
 
 def make_regular_polygon(width, height, nsides, points=None, parent=None, invert=True):
-    geometry = []
+    """
+    Make the sides of a regular polygonal bar
+
+    The first side is defined by points (or placed so that the bar axis is
+    the parent z-axis), and every other side is that side rotated around
+    the bar axis by a multiple of the exterior angle, computed in one
+    batch in closed form.
+
+    Parameters
+    -----------
+    width : float
+        width of each side
+    height : float
+        height (length along the bar axis) of each side
+    nsides : int
+        number of sides
+    points : tuple of vectors, optional
+        p1, p2, p3 defining the first side, as in Panel
+    parent : Frame, optional
+    invert : bool
+        If True, the bar hangs down from z=height
+
+    Returns
+    --------
+    geometry : list of Panel
+    """
     interior_angle = deg_to_rad(360.0 / nsides)
     if invert:
         az = -1
@@ -74,24 +209,18 @@ def make_regular_polygon(width, height, nsides, points=None, parent=None, invert
     else:
         p1, p2, p3 = points
 
-    def _newSideFromSide(side):
-        prev_edges = side.real_edges(vec(0, 0, 0), 0)
-        new_vector = vec(np.cos(np.pi - interior_angle), 0, -np.sin(np.pi - interior_angle))
-        p1 = prev_edges[1]
-        p2 = prev_edges[2]
-        p3 = side.frame_to_global(new_vector + side.edges[1], r=0, rotation="global")
-        return Panel(p1, p2, p3, width=width, height=height, parent=parent)
-
-    current_side = Panel(p1, p2, p3, width=width, height=height, parent=parent)
-    geometry.append(current_side)
-    new_sides = []
-    for n in range(1, nsides):
-        new_side = _newSideFromSide(current_side)
-        new_sides.append(new_side)
-        current_side = new_side
-    # It is unfortunately easier to generate sides in reverse order
-    # due to the coordinate system, so we must reverse them.
-    geometry += new_sides[::-1]
+    n1, n2, n3 = constructBasis(p1, p2, p3)
+    apothem = width / (2.0 * np.tan(interior_angle / 2.0))
+    center = p1 + n1 * width / 2.0 - n3 * apothem
+    # Side k is the first side turned by k exterior angles around the bar
+    # axis, which runs along n2 through the center of the polygon
+    R = rotAxisMat(n2, -interior_angle * np.arange(nsides))
+    origins = center + np.einsum("kij,j->ki", R, p1 - center)
+    xaxes = np.einsum("kij,j->ki", R, n1)
+    geometry = [
+        Panel(origin, origin + n2, origin + xaxis, width=width, height=height, parent=parent)
+        for origin, xaxis in zip(origins, xaxes)
+    ]
     return geometry
 
 
@@ -101,10 +230,14 @@ class SampleHolder(Device):
     we can just operate on the SampleHolder...
     """
 
+    SUB_SAMPLES = "samples"
+
     sample = Cpt(Sample, kind="config")
 
-    def __init__(self, *args, manipulator=None, geometry=None, **kwargs):
+    def __init__(self, *args, manipulator=None, geometry=None, table_angles=(0, 90), **kwargs):
         super().__init__(*args, **kwargs)
+        self._table_angles = np.atleast_1d(np.asarray(table_angles, dtype=float))
+        self._coordinate_tables = {}
         self.add_manipulator(manipulator)
         self._reset()
         if geometry is not None:
@@ -116,17 +249,32 @@ class SampleHolder(Device):
         self.manipulator = manipulator
 
     def _reset(self):
-        self.clear_samples()
+        self._clear_samples()
         self.sides = []
         self._has_geometry = False
 
+    def _samples_changed(self):
+        """
+        Notify SUB_SAMPLES subscribers that the sample list changed
+        """
+        self._run_subs(sub_type=self.SUB_SAMPLES, samples=self.samples)
+
     def clear_samples(self):
         """
         Removes all samples from holder, if any, and re-adds
         the null frame
         """
+        self._clear_samples()
+        self._samples_changed()
+
+    def _clear_samples(self):
+        for side in getattr(self, "sides", []):
+            if isinstance(side, Panel):
+                side.clear_samples()
         self.sample_frames = {}
         self.sample_md = {}
+        self._plain_md = {}
+        self._invalidate_table()
         null_frame = NullFrame()
         self._add_frame(null_frame, "null", "null", -1)
         self.set("null")
@@ -140,7 +288,78 @@ class SampleHolder(Device):
         return self.sample_frames[self.sample.sample_id.get()]
 
     def update_side(self, side_num, *args):
-        self.sides[side_num].update_basis(*args)
+        side = self.sides[side_num]
+        side.update_basis(*args)
+        if isinstance(side, Frame):
+            # Intervals have no rotation
+            side.update_rotation()
+            for frame in self.sample_frames.values():
+                if getattr(frame, "parent", None) is side:
+                    frame.update_rotation()
+        self._invalidate_table()
+
+    def fit_alignment(self, poses, edge_ids, update=True):
+        """
+        Fit side bases and widths and the holder offset to measured edge
+        crossings. The fit is an iterated, linearized least-squares solve
+        (see sst_base.geometry.alignment.fit_alignment), not a closed form
+
+        Parameters
+        -----------
+        poses : array, shape (n, 4)
+            Beam-centered manipulator x, y, z, r at which the beam was on
+            an edge
+        edge_ids : sequence of (side, edge) tuples
+            Side number (starting from 1) and edge of each crossing. Edge 0
+            is the x = 0 long edge of the side, edge 1 the x = width edge
+        update : bool
+            If True, update the basis and width of every side that had
+            enough crossings to be fit. Sides must then have the default
+            rectangular outline
+
+        Returns
+        --------
+        result : dict
+            "offset": translation of the holder from its nominal position,
+            "sides": {side number: (p1, p2, p3)} in the parent coordinates
+            of each fitted side, "width": {side number: fitted width},
+            "residuals": distance of each crossing from its fitted edge
+        """
+        if not self._has_geometry:
+            raise RuntimeError("Bar has no geometry loaded. " "Call load_geometry first")
+        edge_ids = np.asarray(edge_ids, dtype=int).reshape(-1, 2)
+        sides = edge_ids[:, 0] - 1
+        edges = edge_ids[:, 1]
+        if np.any(sides < 0) or np.any(sides >= len(self.sides)):
+            raise ValueError(f"Side numbers must be between 1 and {len(self.sides)}")
+        if np.any((edges != 0) & (edges != 1)):
+            raise ValueError("Edge must be 0 or 1")
+        if not all(isinstance(side, Panel) for side in self.sides):
+            raise ValueError("Alignment can only be fit for holders made of Panel sides")
+        if update and not all(side._rectangle for side in self.sides):
+            raise ValueError("Only sides with the default rectangular outline can be updated, use update=False")
+        transforms = [side._root_transform() for side in self.sides]
+        A = np.array([t[0] for t in transforms])
+        origins = np.array([t[1] for t in transforms])
+        widths = np.array([side.width for side in self.sides])
+        offset, p1, p2, p3, width, residuals = fit_alignment(
+            beam_points(poses), beam_directions(poses), sides, edges, A, origins, widths
+        )
+        result = {"offset": offset, "sides": {}, "width": {}, "residuals": residuals}
+        for n, side in enumerate(self.sides):
+            if np.any(np.isnan(p1[n])):
+                continue
+            fitted = [p1[n], p2[n], p3[n]]
+            if side.parent is not None:
+                Ap, tp = side.parent._root_transform()
+                fitted = [np.dot(Ap.T, p - tp) for p in fitted]
+            result["sides"][n + 1] = tuple(fitted)
+            result["width"][n + 1] = width[n]
+        if update:
+            for side_num, fitted in result["sides"].items():
+                self.sides[side_num - 1].set_width(result["width"][side_num])
+                self.update_side(side_num - 1, *fitted)
+        return result
 
     def set(self, sample_id, **kwargs):
         _md = self.sample_md[f"{sample_id}"]
@@ -150,9 +369,35 @@ class SampleHolder(Device):
         return self.sample.set(md)
 
     def current_sample_md(self):
+        """
+        Metadata of the current sample as plain dicts and lists, which can
+        go into documents. The plain form is made once per record version
+        and cached; each call returns a shallow copy, so top-level keys can
+        be changed freely, but nested values are shared and must not be
+        modified. Use update_sample_md to change a sample's metadata, and
+        sample_md for the read-only SampleMetadata records.
+        """
         sample_id = self.sample.sample_id.get()
-        md = copy.deepcopy(self.sample_md[sample_id])
-        return md
+        record = self.sample_md[sample_id]
+        cached = self._plain_md.get(sample_id, None)
+        if cached is None or cached[0] != record.version:
+            cached = (record.version, record.to_dict())
+            self._plain_md[sample_id] = cached
+        return dict(cached[1])
+
+    def update_sample_md(self, sample_id, **kwargs):
+        """
+        Change metadata of a sample. The sample record is replaced by a
+        new one with a new version, and the sample signals are refreshed
+        if it is the current sample.
+        """
+        sample_id = f"{sample_id}"
+        for key in ("sample_id", "side"):
+            if key in kwargs:
+                raise ValueError(f"{key} can not be changed")
+        self.sample_md[sample_id] = self.sample_md[sample_id].replace(**kwargs)
+        if self.sample.sample_id.get() == sample_id:
+            self.set(sample_id)
 
     def _add_frame(self, frame, sample_id, name, side=-1, description="", origin="edge", **kwargs):
         md = {}
@@ -160,12 +405,17 @@ class SampleHolder(Device):
         _md = {"sample_id": f"{sample_id}", "name": name, "side": side, "description": description}
         md.update(_md)
         self.sample_frames[f"{sample_id}"] = frame
-        self.sample_md[f"{sample_id}"] = md
+        self.sample_md[f"{sample_id}"] = SampleMetadata(md)
+        self._invalidate_table()
 
     def add_geometry(self, geometry):
         """
         geometry : List of sides
         """
+        self._add_geometry(geometry)
+        self._samples_changed()
+
+    def _add_geometry(self, geometry):
         self._reset()
         self.sides = geometry
         for n, side in enumerate(geometry):
@@ -177,11 +427,12 @@ class SampleHolder(Device):
     def add_parent_frame(self, frame):
         for s in self.sides:
             s.add_parent_frame(frame)
+        self._invalidate_table()
 
     def add_sample(self, sample_id, name, position, side, t=0, **kwargs):
         """
         sample_id: Unique sample identifier
-        position: x1, y1, x2, y2 tuple
+        position: x1, y1, x2, y2 tuple, or x1, x2 on 1-D sides
         side: side number (starting from 1)
         t: thickness (0 by default)
         kwargs: additional keywords to use as sample metadata, such as description, cas, or other catalog number/info
@@ -193,6 +444,224 @@ class SampleHolder(Device):
         s = self.sides[side - 1]
         frame = s.make_sample_frame(position, t=t)
         self._add_frame(frame, sample_id, name, side, **kwargs)
+        self._samples_changed()
+
+    def add_samples(self, samples):
+        """
+        Validate and add a whole table of samples at once. Either every
+        sample is added, or none are, and subscribers are notified once.
+
+        Parameters
+        -----------
+        samples : sequence of dict
+            One dict per sample, with the keys "sample_id", "name",
+            "position" (x1, y1, x2, y2, or x1, x2 on 1-D sides), "side"
+            (starting from 1), and optionally "t" (thickness). All other
+            keys are used as sample metadata, as for add_sample
+        """
+        if not self._has_geometry:
+            raise RuntimeError("Bar has no geometry loaded. " "Call load_geometry first")
+        samples = list(samples)
+        if len(samples) == 0:
+            return
+        required = ("sample_id", "name", "position", "side")
+        for n, row in enumerate(samples):
+            missing = [k for k in required if k not in row]
+            if len(missing) > 0:
+                raise ValueError(f"Sample {n} is missing {missing}")
+        sample_ids = [f"{row['sample_id']}" for row in samples]
+        if len(set(sample_ids)) != len(sample_ids):
+            duplicates = sorted({s for s in sample_ids if sample_ids.count(s) > 1})
+            raise ValueError(f"Duplicate sample ids {duplicates}")
+        try:
+            sides = np.array([row["side"] for row in samples], dtype=int)
+            t = np.array([row.get("t", 0) for row in samples], dtype=float)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Could not read sample table: {e}")
+        bad = (sides < 1) | (sides > len(self.sides))
+        if np.any(bad):
+            raise ValueError(
+                f"Samples {[sample_ids[n] for n in np.flatnonzero(bad)]} have sides outside of"
+                f" 1-{len(self.sides)}"
+            )
+        try:
+            positions = [np.array(row["position"], dtype=float) for row in samples]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Could not read sample table: {e}")
+        for sample_id, position, side in zip(sample_ids, positions, sides):
+            if isinstance(self.sides[side - 1], Interval):
+                if position.shape != (2,):
+                    raise ValueError(f"Sample {sample_id} is on a 1-D side, its position must be x1, x2")
+            elif position.shape != (4,):
+                raise ValueError(f"Sample {sample_id} position must be x1, y1, x2, y2")
+        bad = ~np.isfinite(t)
+        for n, position in enumerate(positions):
+            half = len(position) // 2
+            bad[n] |= not np.all(np.isfinite(position)) or np.any(position[:half] == position[half:])
+        if np.any(bad):
+            raise ValueError(f"Samples {[sample_ids[n] for n in np.flatnonzero(bad)]} have invalid positions")
+
+        frames = [None] * len(samples)
+        for side in np.unique(sides):
+            rows = np.flatnonzero(sides == side)
+            new_frames = self.sides[side - 1].add_samples([positions[n] for n in rows], t[rows])
+            for n, frame in zip(rows, new_frames):
+                frames[n] = frame
+        for row, frame, side in zip(samples, frames, sides):
+            md = {k: v for k, v in row.items() if k not in ("sample_id", "name", "position", "side", "t")}
+            self._add_frame(frame, row["sample_id"], row["name"], int(side), **md)
+        self._samples_changed()
+
+    def save_snapshot(self, filename):
+        """
+        Save the geometry, samples and sample metadata to an npz file,
+        see sst_base.snapshot
+        """
+        save_snapshot(self, filename)
+
+    def load_snapshot(self, filename):
+        """
+        Replace the geometry and samples with those saved by save_snapshot.
+        Subscribers are notified once the whole table is loaded.
+        """
+        load_snapshot(self, filename)
+
+    @property
+    def table_angles(self):
+        return self._table_angles
+
+    def set_table_angles(self, angles):
+        """
+        Set the frame rotations (degrees, 0 = grazing, 90 = normal) at which
+        the coordinate table is evaluated. Invalidates the table.
+        """
+        self._table_angles = np.atleast_1d(np.asarray(angles, dtype=float))
+        self._invalidate_table()
+
+    def _invalidate_table(self):
+        self._coordinate_tables = {}
+
+    def coordinate_table(self, origin="edge"):
+        """
+        Beam-centered manipulator coordinates for every sample frame on the
+        holder, evaluated at each of the table angles. The table is computed
+        in one batch and cached until the geometry or the sample list changes.
+
+        Only frames with a 3D basis are included; the null frame and 1D
+        intervals are skipped.
+
+        Parameters
+        -----------
+        origin : str
+            "edge" or "center", same meaning as in frame_to_beam
+
+        Returns
+        --------
+        sample_ids : list of str
+            Row labels of the table
+        coordinates : array, shape (nsamples, nangles, 4)
+            The x, y, z, r manipulator coordinates that put each sample
+            origin into the beam, for each angle in table_angles
+        """
+        if origin not in self._coordinate_tables:
+            self._coordinate_tables[origin] = self._compute_coordinate_table(origin)
+        return self._coordinate_tables[origin]
+
+    def _compute_coordinate_table(self, origin):
+        sample_ids = []
+        A = []
+        p0 = []
+        r0 = []
+        v = []
+        for sample_id, frame in self.sample_frames.items():
+            if not isinstance(frame, Frame):
+                continue
+            _A, _p0 = frame._root_transform()
+            sample_ids.append(sample_id)
+            A.append(_A)
+            p0.append(_p0)
+            r0.append(frame.r0)
+            if origin == "center" and isinstance(frame, Panel):
+                v.append(vec(frame.width / 2.0, frame.height / 2.0, 0))
+            else:
+                v.append(vec(0, 0, 0))
+        angles = self._table_angles
+        coordinates = np.zeros((len(sample_ids), len(angles), 4))
+        if len(sample_ids) == 0:
+            return sample_ids, coordinates
+        v_root = np.einsum("nij,nj->ni", np.array(A), np.array(v)) + np.array(p0)
+        gr = angles[np.newaxis, :] + np.array(r0)[:, np.newaxis]
+        # Rotate the root coordinates by the frame rotation, and negate to
+        # move the point onto the beam
+        coordinates[..., :3] = -rotz(-deg_to_rad(gr), v_root[:, np.newaxis, :])
+        coordinates[..., 3] = gr
+        return sample_ids, coordinates
+
+    def beam_footprint(self, sample_id, fx, fy, fr, beam_size, divergence=(0, 0), origin="edge"):
+        """
+        Illuminated area on a sample for arrays of beam positions and
+        incidence angles, with the fraction that spills off the sample and
+        onto each neighbor on the same side
+
+        Parameters
+        -----------
+        sample_id : str
+        fx, fy : float or array
+            Beam position in the sample frame
+        fr : float or array, degrees
+            Incidence angle (0 = grazing, 90 = normal)
+        beam_size : tuple
+            Full width of the beam along global x and z
+        divergence : tuple
+            Full divergence angles of the beam along global x and z, radians
+        origin : str
+            "edge" or "center", as in frame_to_beam
+
+        Returns
+        --------
+        footprint : array, shape (..., 4, 2)
+            Illuminated quadrilateral in sample frame x, y (edge origin)
+        overlap : array, shape (...)
+            Fraction of the footprint that lies on the sample
+        neighbors : dict
+            Fraction of the footprint on each other sample of the same side,
+            keyed by sample id. Only samples the footprint touches are listed
+        """
+        frame = self.sample_frames[f"{sample_id}"]
+        if not isinstance(frame, Panel):
+            raise ValueError(f"Sample {sample_id} has no boundaries to illuminate")
+        gx, gy, gz, gr = frame.frame_to_beam(fx, fy, 0, fr, origin=origin)
+        footprint = frame.beam_footprint(gx, gy, gz, gr, beam_size, divergence)
+        area = polygonAreas(footprint)
+
+        def _fraction(outline, holes=()):
+            # The footprint is convex, so the sample outline, which need
+            # not be, is clipped by the footprint. Holes lie inside the
+            # outline, so their overlap is subtracted
+            covered = polygonAreas(clipPolygons(outline, footprint))
+            for hole in holes:
+                covered = covered - polygonAreas(clipPolygons(hole, footprint))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return covered / area
+
+        overlap = _fraction(np.array(frame.edges)[:, :2], [np.array(h)[:, :2] for h in frame.holes])
+        A, p0 = frame._root_transform()
+        side = self.sample_md[f"{sample_id}"]["side"]
+        neighbors = {}
+        for other_id, other in self.sample_frames.items():
+            if other is frame or other in self.sides or not isinstance(other, Panel):
+                continue
+            if self.sample_md[other_id]["side"] != side:
+                continue
+            oA, op0 = other._root_transform()
+
+            def _to_frame(points):
+                return np.dot(np.dot(np.array(points), oA.T) + op0 - p0, A)[:, :2]
+
+            fraction = _fraction(_to_frame(other.edges), [_to_frame(h) for h in other.holes])
+            if np.any(fraction > 0):
+                neighbors[other_id] = fraction
+        return footprint, overlap, neighbors
 
     def frame_to_beam(self, *args, **kwargs):
         md = {"origin": self.sample.origin.get()}
@@ -207,7 +676,7 @@ class SampleHolder(Device):
     def distance_to_beam(self, *args, **kwargs):
         if self._has_geometry:
             distances = [side.distance_to_beam(*args) for side in self.sides]
-            return np.min(distances)
+            return np.min(distances, axis=0)
         else:
             distance = self.current_frame.distance_to_beam(*args)
             return distance
@@ -0,0 +1,203 @@
+import numpy as np
+
+"""
+Module that orders multi-sample queues to minimize manipulator travel time.
+
+Travel between two samples is modeled as simultaneous moves of every axis,
+so the time for a move is set by the slowest axis, plus an optional fixed
+penalty whenever the bar has to be turned to a different side.
+"""
+
+
+def travel_time_matrix(coordinates, speeds, sides=None, side_change_time=0):
+    """
+    Pairwise move times between manipulator positions
+
+    Parameters
+    -----------
+    coordinates : array, shape (n, naxes)
+        Manipulator coordinates of each sample
+    speeds : sequence of float, length naxes
+        Speed of each axis, in axis units per second
+    sides : sequence, optional
+        Side of each sample. Moves between different sides pay side_change_time
+    side_change_time : float
+        Extra time (s) for a side change, e.g. rotation settling
+
+    Returns
+    --------
+    times : array, shape (n, n)
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    speeds = np.asarray(speeds, dtype=float)
+    delta = np.abs(coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :])
+    times = np.max(delta / speeds, axis=-1)
+    if sides is not None:
+        sides = np.asarray(sides)
+        times += side_change_time * (sides[:, np.newaxis] != sides[np.newaxis, :])
+    return times
+
+
+def path_time(times, order, start_times=None):
+    """
+    Total time to visit the samples in order
+
+    Parameters
+    -----------
+    times : array, shape (n, n)
+        Output of travel_time_matrix
+    order : sequence of int
+        Visiting order
+    start_times : array, shape (n,), optional
+        Time to move from the starting position to each sample
+    """
+    order = np.asarray(order, dtype=int)
+    if len(order) == 0:
+        return 0.0
+    total = np.sum(times[order[:-1], order[1:]])
+    if start_times is not None:
+        total += start_times[order[0]]
+    return float(total)
+
+
+def _augmented_times(times, start_times):
+    """
+    Add a fixed start node (index 0) to the time matrix. With no start
+    position, the start node is free to connect to any sample.
+    """
+    n = times.shape[0]
+    full = np.zeros((n + 1, n + 1))
+    full[1:, 1:] = times
+    if start_times is not None:
+        full[0, 1:] = start_times
+        full[1:, 0] = start_times
+    return full
+
+
+def _nearest_neighbor(full):
+    n = full.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    path = [0]
+    for _ in range(n - 1):
+        t = np.where(visited, np.inf, full[path[-1]])
+        nxt = int(np.argmin(t))
+        visited[nxt] = True
+        path.append(nxt)
+    return np.array(path)
+
+
+def _two_opt(full, path, max_passes=50):
+    """
+    Improve an open path with a fixed first node by segment reversals.
+    """
+    n = len(path)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a = path[i - 1]
+            b = path[i]
+            j = np.arange(i + 1, n)
+            c = path[j]
+            removed = full[a, b] + np.where(j < n - 1, full[c, path[np.minimum(j + 1, n - 1)]], 0)
+            added = full[a, c] + np.where(j < n - 1, full[b, path[np.minimum(j + 1, n - 1)]], 0)
+            gain = removed - added
+            k = int(np.argmax(gain))
+            if gain[k] > 1e-12:
+                path[i:j[k] + 1] = path[i:j[k] + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return path
+
+
+def optimize_order(coordinates, speeds, sides=None, side_change_time=0, start=None):
+    """
+    Find a near-minimal travel-time visiting order with a nearest neighbor
+    tour improved by 2-opt
+
+    Parameters
+    -----------
+    coordinates : array, shape (n, naxes)
+        Manipulator coordinates of each sample
+    speeds : sequence of float, length naxes
+        Speed of each axis, in axis units per second
+    sides : sequence, optional
+        Side of each sample, used for side_change_time
+    side_change_time : float
+        Extra time (s) for a side change
+    start : sequence of float, optional
+        Current manipulator coordinates. If None, the tour may start anywhere
+
+    Returns
+    --------
+    order : array of int
+        Indices into coordinates, in visiting order
+    time_saved : float
+        Estimated travel time saved compared to the original order (s)
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    n = coordinates.shape[0]
+    if n == 0:
+        return np.array([], dtype=int), 0.0
+    times = travel_time_matrix(coordinates, speeds, sides, side_change_time)
+    if start is not None:
+        start = np.asarray(start, dtype=float)
+        start_times = np.max(np.abs(coordinates - start) / np.asarray(speeds, dtype=float), axis=-1)
+    else:
+        start_times = None
+    full = _augmented_times(times, start_times)
+    path = _two_opt(full, _nearest_neighbor(full))
+    order = path[1:] - 1
+    original = path_time(times, np.arange(n), start_times)
+    optimized = path_time(times, order, start_times)
+    if optimized > original:
+        return np.arange(n), 0.0
+    return order, original - optimized
+
+
+def order_holder_samples(holder, sample_ids, speeds, side_change_time=0, angle=None, start=None,
+                         origin="edge"):
+    """
+    Order samples on a SampleHolder using its cached coordinate table
+
+    Parameters
+    -----------
+    holder : SampleHolder
+    sample_ids : list of str
+        Samples to visit, in the order requested by the user
+    speeds : sequence of float
+        x, y, z, r axis speeds (mm/s and deg/s)
+    side_change_time : float
+        Extra time (s) for a side change
+    angle : float, optional
+        Frame rotation the samples will be measured at. Must be one of
+        holder.table_angles. Defaults to the first table angle
+    start : sequence of float, optional
+        Current beam-centered x, y, z, r of the manipulator
+    origin : str
+        "edge" or "center", passed to coordinate_table
+
+    Returns
+    --------
+    sample_ids : list of str
+        The samples in visiting order
+    time_saved : float
+        Estimated travel time saved (s)
+    """
+    table_ids, coordinates = holder.coordinate_table(origin)
+    if angle is None:
+        j = 0
+    else:
+        matches = np.flatnonzero(np.isclose(holder.table_angles, angle))
+        if len(matches) == 0:
+            raise ValueError(f"Angle {angle} not in holder table angles {holder.table_angles}")
+        j = matches[0]
+    index = {sample_id: n for n, sample_id in enumerate(table_ids)}
+    missing = [s for s in sample_ids if f"{s}" not in index]
+    if len(missing) > 0:
+        raise ValueError(f"Samples {missing} have no entry in the coordinate table")
+    rows = [index[f"{s}"] for s in sample_ids]
+    sides = [holder.sample_md[f"{s}"]["side"] for s in sample_ids]
+    order, time_saved = optimize_order(coordinates[rows, j], speeds, sides, side_change_time, start)
+    return [sample_ids[n] for n in order], time_saved
@@ -1,5 +1,113 @@
-from ophyd import Device
+from ophyd import Device, Signal, Component as Cpt
+from ophyd.status import StatusBase
+import numpy as np
+import math
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
 
 class DummyObject(Device):
     def __init__(self, *args, name, **kwargs):
         super().__init__(*args, name=name)
+
+
+def edge_transmission(distance, beam_size, profile="gaussian"):
+    """
+    Fraction of the beam that passes a straight edge
+
+    Parameters
+    -----------
+    distance : float or array
+        Signed distance from the beam center to the nearest edge. Negative
+        when the beam center is on the holder, as in distance_to_beam
+    beam_size : float
+        Gaussian sigma, or the full width of a flat-top beam
+    profile : str
+        "gaussian" or "flat"
+
+    Returns
+    --------
+    transmission : float or array, between 0 and 1
+    """
+    distance = np.asarray(distance, dtype=float)
+    if beam_size <= 0:
+        return (distance > 0).astype(float)
+    if profile == "gaussian":
+        return 0.5 * (1 + _erf(distance / (beam_size * np.sqrt(2))))
+    elif profile == "flat":
+        return np.clip(0.5 + distance / beam_size, 0, 1)
+    else:
+        raise ValueError(f"Unknown beam profile {profile}, expected 'gaussian' or 'flat'")
+
+
+class SimEdgeDetector(Device):
+    """
+    Soft detector that reports the beam intensity transmitted past a
+    SampleHolder, for developing alignment scans offline.
+
+    The signed beam-to-edge distance comes from the holder geometry and is
+    convolved with a 1D beam profile. Use transmission() directly to
+    evaluate many manipulator positions at once.
+    """
+
+    intensity = Cpt(Signal, value=0, kind="hinted")
+    i0 = Cpt(Signal, value=1, kind="config")
+    beam_size = Cpt(Signal, value=0.1, kind="config")
+    profile = Cpt(Signal, value="gaussian", kind="config")
+    noise = Cpt(Signal, value=0, kind="config")
+    sample_only = Cpt(Signal, value=False, kind="config")
+
+    def __init__(self, *args, holder, manipulator=None, origin=(0, 0, 0), **kwargs):
+        """
+        Parameters
+        -----------
+        holder : SampleHolder
+        manipulator : optional
+            Positioner with a real_position (x, y, z, r), or a sequence of
+            four positioners. Defaults to holder.manipulator
+        origin : tuple
+            Manipulator x, y, z that puts the holder origin in the beam.
+            Ignored if the manipulator has a manip_to_beam_frame method
+        """
+        super().__init__(*args, **kwargs)
+        self.holder = holder
+        self.manipulator = manipulator
+        self.origin = origin
+        self._rng = np.random.default_rng()
+        self.intensity.name = self.name
+
+    def _beam_position(self):
+        manipulator = self.manipulator
+        if manipulator is None:
+            manipulator = self.holder.manipulator
+        if hasattr(manipulator, "real_position"):
+            position = tuple(manipulator.real_position)
+        else:
+            position = tuple(m.position for m in manipulator)
+        if hasattr(manipulator, "manip_to_beam_frame"):
+            return manipulator.manip_to_beam_frame(*position)
+        ox, oy, oz = self.origin
+        x, y, z, r = position
+        return (x - ox, y - oy, z - oz, r)
+
+    def transmission(self, x, y, z, r):
+        """
+        Transmitted intensity for beam-centered manipulator coordinates,
+        which may be arrays. Noise is not applied.
+        """
+        if self.sample_only.get():
+            distance = self.holder.sample_distance_to_beam(x, y, z, r)
+        else:
+            distance = self.holder.distance_to_beam(x, y, z, r)
+        t = edge_transmission(distance, self.beam_size.get(), self.profile.get())
+        return self.i0.get() * t
+
+    def trigger(self):
+        value = float(self.transmission(*self._beam_position()))
+        noise = self.noise.get()
+        if noise > 0:
+            value += self._rng.normal(0, noise * self.i0.get())
+        self.intensity.put(value)
+        status = StatusBase()
+        status.set_finished()
+        return status
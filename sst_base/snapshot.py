@@ -0,0 +1,311 @@
+import json
+import numpy as np
+from collections.abc import Mapping
+from .geometry.frames import Axis, Interval, Frame, Panel, SampleFrame
+
+"""
+Module that saves and restores the geometry and sample table of a
+SampleHolder as a single npz file.
+
+Side bases are stored as the three points that define them, samples as the
+contiguous origin/extent arrays of the panel sample stores, sorted by side,
+and metadata as JSON. Holders made of Interval sides (see make_1d_bar) are
+stored as the offset, length and scale of each side and parent axis, with
+x1 in the first origin column and x2 - x1 in the first extent column of
+each sample. Arrays are stored uncompressed, so restoring hands
+slices of the loaded arrays straight to the sample stores without copying.
+
+Metadata tuples, sets and numpy arrays are tagged in the JSON so that they
+come back as the same types. Any other value that JSON can not hold is
+refused when saving, rather than being turned into a string.
+"""
+
+SNAPSHOT_VERSION = 2
+
+_TAGS = ({"__tuple__"}, {"__set__"}, {"__ndarray__", "dtype", "shape"})
+
+
+def _encode_md(value):
+    """
+    Convert a metadata value into JSON types, tagging tuples, sets and
+    arrays
+    """
+    if isinstance(value, Mapping):
+        if set(value) in _TAGS:
+            raise ValueError(f"Metadata dict keys {sorted(value)} are reserved for snapshots")
+        for k in value:
+            if not isinstance(k, str):
+                raise ValueError(f"Metadata dict key {k!r} is not a string")
+        return {k: _encode_md(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_encode_md(v) for v in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode_md(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted((_encode_md(v) for v in value), key=json.dumps)}
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in "biufU":
+            raise ValueError(f"Can not save metadata array of dtype {value.dtype}")
+        return {"__ndarray__": value.ravel().tolist(), "dtype": value.dtype.str, "shape": list(value.shape)}
+    if isinstance(value, np.generic):
+        return _encode_md(value.item())
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise ValueError(f"Can not save metadata value {value!r} of type {type(value).__name__}")
+
+
+def _decode_md(obj):
+    """
+    json object_hook that undoes the tags of _encode_md
+    """
+    keys = set(obj)
+    if keys == {"__tuple__"}:
+        return tuple(obj["__tuple__"])
+    if keys == {"__set__"}:
+        return set(obj["__set__"])
+    if keys == {"__ndarray__", "dtype", "shape"}:
+        return np.array(obj["__ndarray__"], dtype=obj["dtype"]).reshape(obj["shape"])
+    return obj
+
+
+def _md_equal(a, b):
+    return _encode_md(a) == _encode_md(b)
+
+
+def _dump_md(md):
+    return json.dumps(_encode_md(md))
+
+
+def _load_md(snapshot):
+    return json.loads(str(snapshot["metadata"]), object_hook=_decode_md)
+
+
+def _parent_chain(sides):
+    """
+    Frames above the sides, from the closest parent to the top. Every side
+    must share the same chain.
+    """
+    chain = []
+    parent = sides[0].parent
+    while parent is not None:
+        chain.append(parent)
+        parent = parent.parent
+    for side in sides[1:]:
+        if side.parent is not (chain[0] if chain else None):
+            raise ValueError("All sides must share the same parent frame to be saved")
+    return chain
+
+
+def _is_rectangle(side):
+    rectangle = [(0, 0), (side.width, 0), (side.width, side.height), (0, side.height)]
+    edges = [e[:2] for e in side.edges]
+    return len(edges) == 4 and np.allclose(edges, rectangle)
+
+
+def save_snapshot(holder, filename):
+    """
+    Save the geometry, samples and metadata of a holder
+
+    Parameters
+    -----------
+    holder : SampleHolder
+    filename : str
+        Output file; numpy adds ".npz" if it is missing
+    """
+    if not holder._has_geometry:
+        raise ValueError("Holder has no geometry to save")
+    sides = holder.sides
+    chain = _parent_chain(sides)
+    if all(isinstance(side, Interval) for side in sides):
+        geometry = _interval_geometry(sides, chain)
+        sample_type = Interval
+    else:
+        geometry = _panel_geometry(sides, chain)
+        sample_type = SampleFrame
+
+    side_index = {id(side): n for n, side in enumerate(sides)}
+    sample_ids = []
+    sample_side = []
+    origin = []
+    extent = []
+    for sample_id, frame in holder.sample_frames.items():
+        if not isinstance(frame, sample_type) or id(frame.parent) not in side_index:
+            continue
+        if sample_type is Interval:
+            origin.append((frame.x0, 0, 0))
+            extent.append((frame.length, 0))
+        else:
+            if not frame.axis_aligned:
+                raise ValueError(f"Sample {sample_id} has its own basis and can not be saved")
+            origin.append(frame.p0)
+            extent.append((frame.width, frame.height))
+        sample_ids.append(sample_id)
+        sample_side.append(side_index[id(frame.parent)])
+    order = np.argsort(sample_side, kind="stable")
+    sample_side = np.array(sample_side, dtype=int).reshape(-1)[order]
+
+    md = {k: v.to_dict() for k, v in holder.sample_md.items()}
+    np.savez(
+        filename,
+        version=np.array(SNAPSHOT_VERSION),
+        **geometry,
+        sample_ids=np.array(sample_ids, dtype=str)[order],
+        sample_side=sample_side,
+        sample_offsets=np.searchsorted(sample_side, np.arange(len(sides) + 1)),
+        sample_origin=np.array(origin, dtype=float).reshape(-1, 3)[order],
+        sample_extent=np.array(extent, dtype=float).reshape(-1, 2)[order],
+        metadata=np.array(_dump_md(md)),
+        current=np.array(f"{holder.sample.sample_id.get()}"),
+        table_angles=np.asarray(holder.table_angles, dtype=float),
+    )
+
+
+def _panel_geometry(sides, chain):
+    for side in sides:
+        if not isinstance(side, Panel) or len(side.holes) > 0 or not _is_rectangle(side):
+            raise ValueError("Only rectangular Panel sides or Interval sides can be saved")
+    for frame in chain:
+        if not isinstance(frame, Frame):
+            raise ValueError("Panel sides can only be saved with Frame parents")
+    return dict(
+        geometry=np.array("panels"),
+        side_points=np.array([side.vectors for side in sides], dtype=float),
+        side_size=np.array([(side.width, side.height) for side in sides], dtype=float),
+        parent_points=np.array([frame.vectors for frame in chain], dtype=float).reshape(-1, 3, 3),
+        parent_axis=np.array([frame.rot_meas_axis for frame in chain], dtype=int),
+    )
+
+
+def _interval_geometry(sides, chain):
+    for frame in chain:
+        if not isinstance(frame, Axis):
+            raise ValueError("Interval sides can only be saved with Axis parents")
+    return dict(
+        geometry=np.array("intervals"),
+        side_axes=np.array([(side.x0, side.length, side.scale) for side in sides], dtype=float),
+        parent_axes=np.array([(frame.x0, frame.scale) for frame in chain], dtype=float).reshape(-1, 2),
+    )
+
+
+def _geometry(snapshot):
+    if "geometry" in snapshot.files:
+        return str(snapshot["geometry"])
+    return "panels"
+
+
+def read_snapshot(filename):
+    """
+    Open a snapshot, checking its version
+
+    Returns
+    --------
+    snapshot : NpzFile
+        Arrays are only read from disk when accessed
+    """
+    snapshot = np.load(filename)
+    version = int(snapshot["version"])
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than supported version {SNAPSHOT_VERSION}")
+    return snapshot
+
+
+def load_snapshot(holder, filename):
+    """
+    Replace the geometry and samples of a holder with a saved snapshot
+
+    Parameters
+    -----------
+    holder : SampleHolder
+    filename : str
+    """
+    snapshot = read_snapshot(filename)
+    parent = None
+    if _geometry(snapshot) == "intervals":
+        for x0, scale in snapshot["parent_axes"][::-1]:
+            parent = Axis(x0, scale, parent=parent)
+        sides = [Interval(x0, length, scale, parent=parent) for x0, length, scale in snapshot["side_axes"]]
+    else:
+        for points, axis in zip(snapshot["parent_points"][::-1], snapshot["parent_axis"][::-1]):
+            parent = Frame(*points, parent=parent, rot_meas_axis=int(axis))
+        sides = [
+            Panel(*points, width=size[0], height=size[1], parent=parent)
+            for points, size in zip(snapshot["side_points"], snapshot["side_size"])
+        ]
+    holder._add_geometry(sides)
+    md = _load_md(snapshot)
+    sample_ids = snapshot["sample_ids"]
+    origin = snapshot["sample_origin"]
+    extent = snapshot["sample_extent"]
+    offsets = snapshot["sample_offsets"]
+    frames = {}
+    for n, side in enumerate(sides):
+        start, stop = offsets[n], offsets[n + 1]
+        if isinstance(side, Interval):
+            x1 = origin[start:stop, 0]
+            views = side.add_samples(np.stack([x1, x1 + extent[start:stop, 0]], axis=-1))
+        else:
+            views = side.sample_store.adopt(origin[start:stop], extent[start:stop])
+        frames.update(zip(sample_ids[start:stop], views))
+    for sample_id, frame in frames.items():
+        _md = dict(md[sample_id])
+        holder._add_frame(frame, _md.pop("sample_id"), _md.pop("name"), **_md)
+    holder.set_table_angles(snapshot["table_angles"])
+    current = str(snapshot["current"])
+    holder._samples_changed()
+    if current in holder.sample_frames:
+        holder.set(current)
+
+
+def _geometry_arrays(snapshot):
+    """
+    One row of numbers per side and per parent frame, to compare
+    snapshots by
+    """
+    if _geometry(snapshot) == "intervals":
+        return snapshot["side_axes"], snapshot["parent_axes"]
+    points = snapshot["side_points"]
+    sides = np.concatenate([points.reshape(len(points), -1), snapshot["side_size"]], axis=1)
+    return sides, snapshot["parent_points"].reshape(-1, 9)
+
+
+def diff_snapshots(filename1, filename2):
+    """
+    Compare two snapshots
+
+    Returns
+    --------
+    diff : dict
+        "version": versions of both files, "sides": indices of sides whose
+        basis or size changed (all sides if the holders have different
+        kinds or numbers of sides), "parents": True if the parent frames
+        differ, "added"/"removed": sample ids only in the second/first
+        snapshot, "moved": samples whose rectangle changed, "metadata":
+        samples whose metadata changed
+    """
+    a = read_snapshot(filename1)
+    b = read_snapshot(filename2)
+    diff = {"version": (int(a["version"]), int(b["version"]))}
+    sa, pa = _geometry_arrays(a)
+    sb, pb = _geometry_arrays(b)
+    if sa.shape != sb.shape:
+        diff["sides"] = list(range(max(len(sa), len(sb))))
+    else:
+        diff["sides"] = list(np.flatnonzero(~np.all(np.isclose(sa, sb), axis=1)))
+    diff["parents"] = pa.shape != pb.shape or not np.allclose(pa, pb)
+
+    def _rectangles(s):
+        return {
+            i: (side, tuple(o), tuple(e))
+            for i, side, o, e in zip(s["sample_ids"], s["sample_side"], s["sample_origin"], s["sample_extent"])
+        }
+
+    ra = _rectangles(a)
+    rb = _rectangles(b)
+    diff["added"] = sorted(set(rb) - set(ra))
+    diff["removed"] = sorted(set(ra) - set(rb))
+    common = sorted(set(ra) & set(rb))
+    diff["moved"] = [i for i in common if ra[i] != rb[i]]
+    ma = _load_md(a)
+    mb = _load_md(b)
+    diff["metadata"] = sorted(k for k in set(ma) & set(mb) if not _md_equal(ma[k], mb[k]))
+    return diff
@@ -0,0 +1,90 @@
+"""
+Timing of the scalar and batched geometry paths, for checking speedups
+against the invariants in test_geometry_properties.py
+
+Not collected by pytest. Run with
+
+    python sst_base/tests/benchmark_geometry.py [npoints]
+"""
+
+import sys
+import timeit
+import numpy as np
+
+from sst_base.sampleholder import SampleHolder, make_regular_polygon, make_1d_bar
+from sst_base.geometry.linalg import rotz
+from sst_base.geometry.polygons import getMinDist, getMinDists, isInPoly, isInPolygon
+
+
+def _time(func, number):
+    """
+    Best time per call in microseconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def make_holder():
+    holder = SampleHolder(name="benchmark", geometry=make_regular_polygon(24.5, 215, 4))
+    holder.add_samples(
+        [
+            {"sample_id": f"s{i}", "name": f"s{i}", "position": (2, 5 * i, 10, 5 * i + 4), "side": i % 4 + 1}
+            for i in range(40)
+        ]
+    )
+    holder.set("s5")
+    return holder
+
+
+def benchmarks(npoints):
+    rng = np.random.default_rng(0)
+    holder = make_holder()
+    frame = holder.current_frame
+    fx, fy = rng.uniform(0, 8, (2, npoints))
+    fr = rng.uniform(0, 90, npoints)
+    gx, gy, gz, gr = frame.frame_to_beam(fx, fy, 0, fr)
+    bar1d = SampleHolder(name="bar1d", geometry=make_1d_bar(100))
+    x1d = rng.uniform(-10, 110, npoints)
+    outline = np.array([(0, 0), (24.5, 0), (24.5, 215), (0, 215)], dtype=float)
+    points = rng.uniform(-10, 230, (npoints, 2))
+    theta = rng.uniform(-np.pi, np.pi, npoints)
+    v = rng.normal(size=(npoints, 3))
+
+    # name: (scalar call on one point, batched call on all points)
+    return {
+        "frame_to_beam": (
+            lambda: frame.frame_to_beam(fx[0], fy[0], 0, fr[0]),
+            lambda: frame.frame_to_beam(fx, fy, 0, fr),
+        ),
+        "holder distance_to_beam": (
+            lambda: holder.distance_to_beam(gx[0], gy[0], gz[0], gr[0]),
+            lambda: holder.distance_to_beam(gx, gy, gz, gr),
+        ),
+        "1d distance_to_beam": (
+            lambda: bar1d.distance_to_beam(x1d[0]),
+            lambda: bar1d.distance_to_beam(x1d),
+        ),
+        "rotz": (
+            lambda: rotz(theta[0], v[0]),
+            lambda: rotz(theta, v),
+        ),
+        "point in polygon": (
+            lambda: isInPoly(points[0], *outline),
+            lambda: isInPolygon(points, outline),
+        ),
+        "distance to polygon": (
+            lambda: getMinDist(points[0], *outline),
+            lambda: getMinDists(points, outline),
+        ),
+    }
+
+
+def main(npoints=1000):
+    print(f"{'':24s} {'scalar (us)':>12s} {'batched (us/point)':>19s} {'speedup':>8s}")
+    for name, (scalar, batched) in benchmarks(npoints).items():
+        per_point = _time(batched, 10) / npoints
+        single = _time(scalar, 200)
+        print(f"{name:24s} {single:12.2f} {per_point:19.3f} {single / per_point:8.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -1,10 +1,9 @@
 import pytest
 
-from sst_base.sampleholder import SampleHolder
-from sst_funcs.geometry.linalg import vec
+from sst_base.sampleholder import SampleHolder, make_regular_polygon
+from sst_base.geometry.linalg import vec
 import numpy as np
 
-# Needs to be rewritten to follow new SampleHolder api
 
 @pytest.fixture
 def unit_bar():
@@ -19,34 +18,35 @@ def unit_bar():
     height = 10
     nsides = 4
     points = (p1, p2, p3)
-    bar = SampleHolder(name='samplebar')
-    bar.load_geometry(width, height, nsides, points=points)
+    bar = SampleHolder(name="samplebar")
+    bar.add_geometry(make_regular_polygon(width, height, nsides, points=points))
     return bar
 
 
-def test_load_geometry_twice_overwrites(empty_bar):
+def test_add_geometry_twice_overwrites(empty_bar):
     width = 1
     height = 10
     nsides = 5
-    empty_bar.load_geometry(width, height, nsides + 1)
+    empty_bar.add_geometry(make_regular_polygon(width, height, nsides + 1))
     assert len(empty_bar.sides) == nsides + 1
-    empty_bar.load_geometry(width, height, nsides)
+    empty_bar.add_geometry(make_regular_polygon(width, height, nsides))
     assert len(empty_bar.sides) == nsides
+    assert empty_bar.samples == ["null"] + [f"side{n + 1}" for n in range(nsides)]
 
 
 @pytest.fixture
 def empty_bar():
-    bar = SampleHolder(name='samplebar')
+    bar = SampleHolder(name="samplebar")
     return bar
 
 
 def test_bar_edge_distances(unit_bar):
-    assert unit_bar.distance_to_beam(-0.5, 0, -1, 0) == 0
-    assert unit_bar.distance_to_beam(-0.5, -0.5, -1, 0) == 0
-    assert unit_bar.distance_to_beam(0.5, 0, -1, 0) == 0
-    assert unit_bar.distance_to_beam(0, 0, -2, 0) == -0.5
-    assert unit_bar.distance_to_beam(0, 0, -0.25, 0) == -0.25
-    assert unit_bar.distance_to_beam(0, 0, 2, 0) == 2
+    assert np.isclose(unit_bar.distance_to_beam(-0.5, 0, -1, 0), 0)
+    assert np.isclose(unit_bar.distance_to_beam(-0.5, -0.5, -1, 0), 0)
+    assert np.isclose(unit_bar.distance_to_beam(0.5, 0, -1, 0), 0)
+    assert np.isclose(unit_bar.distance_to_beam(0, 0, -2, 0), -0.5)
+    assert np.isclose(unit_bar.distance_to_beam(0, 0, -0.25, 0), -0.25)
+    assert np.isclose(unit_bar.distance_to_beam(0, 0, 2, 0), 2)
 
 
 def test_bar_subframe(unit_bar):
@@ -57,8 +57,11 @@ def test_bar_subframe(unit_bar):
     unit_bar.add_sample(sample_id, name, position, side)
 
     unit_bar.set(1)
-    assert np.all(np.isclose(unit_bar.frame_to_beam(0, 0, 0, 90),
-                             [-0.5, -0.5, -1, 90]))
+    # The sample origin sits at (0.5, -0.5, 1). Turning the bar by 90
+    # degrees takes it to (-0.5, -0.5, 1), which the manipulator then
+    # moves onto the beam
+    assert np.all(np.isclose(unit_bar.frame_to_beam(0, 0, 0, 90), [0.5, 0.5, -1, 90]))
+    assert np.allclose(unit_bar.beam_to_frame(0.5, 0.5, -1, 90), [0, 0, 0, 90])
 
 
 def test_cant_add_sample_to_empty_bar(empty_bar):
@@ -73,7 +76,6 @@ def test_cant_add_sample_to_empty_bar(empty_bar):
 def test_empty_bar_has_position(empty_bar):
     assert empty_bar.distance_to_beam(0, 0, 0, 0) == 0
     rng = np.random.default_rng()
-    for x in 10*rng.random(5):
-        for z in 10*rng.random(5):
-            assert np.isclose(empty_bar.distance_to_beam(x, 0, z, 0),
-                              np.sqrt(x**2 + z**2))
+    for x in 10 * rng.random(5):
+        for z in 10 * rng.random(5):
+            assert np.isclose(empty_bar.distance_to_beam(x, 0, z, 0), np.sqrt(x**2 + z**2))
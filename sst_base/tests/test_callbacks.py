@@ -0,0 +1,77 @@
+import numpy as np
+from bluesky import RunEngine
+from bluesky.plans import grid_scan
+from ophyd.sim import SynAxis
+
+from sst_base.callbacks import SampleCoordinateAnnotator
+from sst_base.sampleholder import SampleHolder, make_regular_polygon
+
+
+def _holder():
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(24.5, 215, 4))
+    holder.add_sample("s1", "sample 1", (2, 10, 12, 30), 1, origin="center")
+    holder.set("s1", origin="center")
+    return holder
+
+
+def test_annotator_grid_scan():
+    holder = _holder()
+    motors = [SynAxis(name=n) for n in "xyzr"]
+    x0, y0, z0, r0 = holder.frame_to_beam(0, 0, 0, 45)
+    for motor, value in zip(motors, (x0, y0, z0, r0)):
+        motor.set(value).wait()
+    docs = []
+    annotator = SampleCoordinateAnnotator(holder, lambda name, doc: docs.append((name, doc)), keys="xyzr")
+    RE = RunEngine({})
+    RE.subscribe(annotator)
+    RE(grid_scan([motors[1], motors[3]], motors[0], x0 - 8, x0 + 8, 5, motors[2], z0 - 12, z0 + 12, 3))
+
+    descriptors = [doc for name, doc in docs if name == "descriptor"]
+    assert len(descriptors) == 1
+    assert descriptors[0]["name"] == "sample_coordinates"
+    assert descriptors[0]["configuration"]["bar"]["data"]["sample_id"] == "s1"
+    pages = [doc for name, doc in docs if name == "event_page"]
+    data = {k: np.concatenate([page["data"][k] for page in pages]) for k in pages[0]["data"]}
+    assert len(data["bar_sx"]) == 15
+    assert np.concatenate([page["seq_num"] for page in pages]).tolist() == list(range(1, 16))
+    assert np.allclose(data["bar_sr"], 45)
+    poses = holder.frame_to_beam(data["bar_sx"], data["bar_sy"], data["bar_sz"], data["bar_sr"])
+    scanned = np.meshgrid(np.linspace(x0 - 8, x0 + 8, 5), np.linspace(z0 - 12, z0 + 12, 3), indexing="ij")
+    assert np.allclose(np.sort(poses[0]), np.sort(scanned[0].ravel()))
+    assert np.allclose(np.sort(poses[2]), np.sort(scanned[1].ravel()))
+    for pose, distance in zip(np.transpose(poses), data["bar_distance"]):
+        assert np.isclose(distance, holder.sample_distance_to_beam(*pose))
+    assert np.all(data["bar_holder_distance"] <= data["bar_distance"])
+
+
+def test_annotator_event_page_batch():
+    holder = _holder()
+    docs = []
+    annotator = SampleCoordinateAnnotator(
+        holder, lambda name, doc: docs.append((name, doc)), keys=["mx", "my", "mz", "mr"], origin=(1, 2, 3)
+    )
+    sx = np.linspace(-4, 4, 50)
+    x, y, z, r = holder.frame_to_beam(sx, 2, 0, 30)
+    annotator("start", {"uid": "run", "time": 0})
+    data_keys = {k: {"dtype": "number", "shape": [], "source": "sim"} for k in ["mx", "my", "mz", "mr", "other"]}
+    annotator("descriptor", {"uid": "d1", "run_start": "run", "name": "fly", "data_keys": data_keys, "time": 0})
+    annotator.streams = None
+    annotator("descriptor", {"uid": "d2", "run_start": "run", "name": "fly", "data_keys": data_keys, "time": 0})
+    page = {
+        "descriptor": "d2",
+        "uid": [f"{i}" for i in range(50)],
+        "time": list(range(50)),
+        "seq_num": list(range(1, 51)),
+        "data": {"mx": x + 1, "my": y + 2, "mz": z + 3, "mr": r, "other": np.zeros(50)},
+        "timestamps": {},
+        "filled": {},
+    }
+    annotator("event_page", dict(page, descriptor="d1"))
+    assert docs == []
+    annotator("event_page", page)
+    (_, descriptor), (_, out) = docs
+    assert out["descriptor"] == descriptor["uid"]
+    assert np.allclose(out["data"]["bar_sx"], sx)
+    assert np.allclose(out["data"]["bar_sy"], 2)
+    assert np.allclose(out["data"]["bar_sr"], 30)
+    assert np.all(np.array(out["data"]["bar_distance"]) < 0)
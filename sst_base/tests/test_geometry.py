@@ -0,0 +1,235 @@
+import pytest
+import numpy as np
+
+from sst_base.geometry.frames import Axis, Interval, Panel, SampleFrame
+from sst_base.geometry.linalg import vec, rotx, rotxMat, roty, rotyMat, rotz, rotzMat
+from sst_base.geometry.polygons import (
+    clipPolygons,
+    isConvex,
+    isInPoly,
+    isInPolygon,
+    polygonAreas,
+    polygonDistance,
+    windingNumbers,
+)
+
+L_SHAPE = np.array([(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)], dtype=float)
+SQUARE = np.array([(0, 0), (4, 0), (4, 4), (0, 4)], dtype=float)
+WINDOW = np.array([(1, 1), (3, 1), (3, 3), (1, 3)], dtype=float)
+
+
+def test_is_convex():
+    assert isConvex(SQUARE)
+    assert isConvex(SQUARE[::-1])
+    assert not isConvex(L_SHAPE)
+
+
+def test_concave_inclusion():
+    points = np.array([[0.5, 0.5], [1.5, 1.5], [1.5, 0.5], [0.5, 1.5], [3, 3]])
+    assert np.all(isInPolygon(points, L_SHAPE) == [True, False, True, True, False])
+    assert np.all(np.abs(windingNumbers(points, L_SHAPE[::-1])) == [1, 0, 1, 1, 0])
+    assert np.allclose(polygonDistance(points, L_SHAPE), [-0.5, 0.5, -0.5, -0.5, np.sqrt(5)])
+
+
+def test_holed_inclusion():
+    points = np.array([[0.5, 0.5], [2, 2], [5, 2]])
+    assert np.all(isInPolygon(points, SQUARE, [WINDOW]) == [True, False, False])
+    assert np.allclose(polygonDistance(points, SQUARE, [WINDOW]), [-0.5, 1, 1])
+
+
+def test_convex_fast_path_matches_isInPoly():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1, 5, (200, 2))
+    expected = [isInPoly(p, *SQUARE) for p in points]
+    assert np.all(isInPolygon(points, SQUARE) == expected)
+    assert np.all((windingNumbers(points, SQUARE) != 0) == expected)
+
+
+@pytest.fixture
+def window_panel():
+    p1 = vec(0, 0, 0)
+    return Panel(p1, p1 + vec(0, 0, -1), p1 + vec(0, 1, 0), width=4, height=4, holes=[WINDOW])
+
+
+def test_panel_with_window(window_panel):
+    assert not window_panel._convex
+    # Beam through the center of the window
+    assert np.isclose(window_panel.distance_to_beam(-2, 0, 2, 90), 1)
+    # Beam on the frame of the panel
+    assert np.isclose(window_panel.distance_to_beam(-0.5, 0, 2, 90), -0.5)
+    x = np.linspace(-5, 1, 13)
+    assert np.allclose(window_panel.distance_to_beam(x, 0, 2, 90),
+                       [window_panel.distance_to_beam(xi, 0, 2, 90) for xi in x])
+
+
+def test_clip_polygons():
+    unit = SQUARE / 4
+    polys = np.array([unit + 0.5, unit + 5, unit * 0.5 + 0.25, (unit - 0.5) * 3 + 0.5])
+    clipped = clipPolygons(polys, unit)
+    assert np.allclose(polygonAreas(clipped), [0.25, 0, 0.25, 1])
+    triangle = np.array([(0, 0), (2, 0), (0, 2)], dtype=float)
+    assert np.allclose(polygonAreas(clipPolygons(unit * 2, triangle)), 2)
+    assert np.allclose(polygonAreas(clipPolygons(unit * 2, triangle[::-1])), 2)
+    # Many-vertex outlines keep a bounded number of vertex slots
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    circle = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    clipped = clipPolygons(circle, circle * 0.9 + 0.5)
+    assert clipped.shape[-2] <= 400
+    with pytest.raises(ValueError):
+        clipPolygons(unit, np.array([(0, 0), (2, 0), (1, 0.5), (2, 2), (0, 2)], dtype=float))
+
+
+@pytest.mark.parametrize("position", [(1, 2, 5, 8), (5, 2, 1, 8), (1, 8, 5, 2), (5, 8, 1, 2)])
+def test_sample_frame_matches_panel(position):
+    """
+    Compact sample frames behave like the Panels make_sample_frame used
+    to create, including for flipped rectangles
+    """
+    p1 = vec(12.25, 12.25, 215)
+    side = Panel(p1, p1 + vec(0, 0, -1), p1 + vec(-1, 0, 0), width=24.5, height=215)
+    x1, y1, x2, y2 = position
+    t = 0.3
+    panel = Panel(vec(x1, y1, t), vec(x1, y2, t), vec(x2, y1, t), width=x2 - x1, height=y2 - y1, parent=side)
+    frame = side.make_sample_frame(position, t=t)
+    assert isinstance(frame, SampleFrame)
+    assert frame.parent is side
+    assert np.allclose(frame.A, panel.A)
+    assert np.isclose(frame.r0, panel.r0)
+    rng = np.random.default_rng(0)
+    for f in rng.uniform(-5, 5, (5, 4)):
+        for origin in ["edge", "center"]:
+            expected = panel.frame_to_beam(*f, origin=origin)
+            assert np.allclose(frame.frame_to_beam(*f, origin=origin), expected)
+            g = panel.beam_to_frame(*expected, origin=origin)
+            assert np.allclose(frame.beam_to_frame(*expected, origin=origin), g)
+        g = panel.frame_to_beam(*f)
+        assert np.isclose(frame.distance_to_beam(*g), panel.distance_to_beam(*g))
+
+
+def test_add_samples_bulk():
+    p1 = vec(0, 0, 0)
+    side = Panel(p1, p1 + vec(0, 0, -1), p1 + vec(0, 1, 0), width=24.5, height=215)
+    positions = np.array([(0, y, 5, y + 4) for y in range(0, 200, 5)], dtype=float)
+    frames = side.add_samples(positions, t=np.linspace(0, 1, len(positions)))
+    assert len(frames) == len(positions)
+    assert side.sample_store.size == len(positions)
+    assert np.allclose(side.sample_store.thickness, np.linspace(0, 1, len(positions)))
+    assert np.allclose([f.p0[:2] for f in frames], positions[:, :2])
+    assert np.allclose([f.height for f in frames], 4)
+
+    assert np.allclose([f.A for f in frames], np.eye(3))
+
+
+def test_sample_store_bases():
+    """
+    Basis matrices are written with each row and survive the store growing
+    and adopting existing arrays
+    """
+    p1 = vec(0, 0, 0)
+    side = Panel(p1, p1 + vec(0, 0, -1), p1 + vec(0, 1, 0), width=24.5, height=215)
+    first = side.add_samples([(5, 2, 1, 8)])[0]
+    side.add_samples([(0, y, 5, y + 4) for y in range(0, 200, 5)])
+    assert len(side.sample_store.A) > 16
+    assert np.allclose(first.A, np.diag([-1, 1, -1]))
+    assert np.allclose(first.Ainv, first.A.T)
+    store = side.sample_store
+    assert np.shares_memory(first.A, store.A) and np.shares_memory(first.p0, store.origin)
+    frames = store.adopt(np.array([(1, 8, 0), (1, 2, 0)], dtype=float), np.array([(4, -6), (4, 6)], dtype=float))
+    assert np.allclose(frames[0].A, np.diag([1, -1, -1]))
+    assert np.allclose(frames[1].A, np.eye(3))
+    assert np.isclose(frames[0].r0, (side.r0 + 180) % 360)
+
+
+def test_sample_frame_update_basis():
+    """
+    update_basis moves a sample frame like it moves a Panel, without
+    touching the other rows of the store
+    """
+    p1 = vec(12.25, 12.25, 215)
+    side = Panel(p1, p1 + vec(0, 0, -1), p1 + vec(-1, 0, 0), width=24.5, height=215)
+    frame, other = side.add_samples([(1, 2, 5, 8), (1, 10, 5, 14)], t=0.3)
+    panel = Panel(vec(1, 2, 0.3), vec(1, 8, 0.3), vec(5, 2, 0.3), width=4, height=6, parent=side)
+    points = (vec(2, 3, 0.5), vec(2.5, 4, 0.5), vec(4, 2, 1))
+    panel.update_basis(*points)
+    panel.update_rotation()
+    frame.update_basis(*points)
+    assert not frame.axis_aligned
+    assert other.axis_aligned
+    assert np.allclose(frame.A, panel.A)
+    assert np.allclose(frame.p0, panel.p0)
+    assert np.isclose(frame.r0, panel.r0)
+    for f in [(1, 2, 0, 0), (3, 4, 0, 30)]:
+        assert np.allclose(frame.frame_to_beam(*f), panel.frame_to_beam(*f))
+    assert np.allclose(other.A, np.diag([1, 1, 1]))
+
+
+def _reference_global_to_frame(frame, x):
+    if frame.parent is not None:
+        x = _reference_global_to_frame(frame.parent, x)
+    return frame.parent_to_frame(x)
+
+
+def _reference_frame_to_global(frame, x):
+    x = frame.frame_to_parent(x)
+    if frame.parent is not None:
+        x = _reference_frame_to_global(frame.parent, x)
+    return x
+
+
+def test_interval_vectorized():
+    bar = Interval(2, 100, 1.5)
+    sample = bar.make_sample_frame((10, 15))
+    x = np.linspace(-50, 200, 101)
+    assert np.allclose(sample.global_to_frame(x), [_reference_global_to_frame(sample, v) for v in x])
+    assert np.allclose(sample.frame_to_global(x), [_reference_frame_to_global(sample, v) for v in x])
+    distance = sample.distance_to_beam(x)
+    assert np.allclose(distance, [sample.distance_to_beam(v) for v in x])
+    assert np.all((distance < 0) == ((sample.global_to_frame(x) > 0) & (sample.global_to_frame(x) < 5)))
+
+    center = x.copy()
+    sample.frame_to_beam(center, origin="center")
+    assert np.all(center == x)
+
+
+def test_interval_cache_invalidated():
+    bar = Interval(0, 100)
+    sample = bar.make_sample_frame((10, 15))
+    assert sample.frame_to_global(0) == 10
+    bar.update_basis(5)
+    assert sample.frame_to_global(0) == 15
+    bar.add_parent_frame(Axis(-5))
+    assert sample.frame_to_global(0) == 10
+
+
+def test_interval_cache_kept_for_unrelated_axes():
+    bar = Interval(0, 100)
+    sample = bar.make_sample_frame((10, 15))
+    other = Interval(0, 100).make_sample_frame((20, 25))
+    assert sample.frame_to_global(0) == 10
+    cached = sample._composed
+    other.update_basis(30)
+    other.parent.update_basis(3)
+    assert other.frame_to_global(0) == 33
+    assert sample.frame_to_global(0) == 10
+    assert sample._composed is cached
+    sample.update_basis(12)
+    assert sample.frame_to_global(0) == 12
+
+
+@pytest.mark.parametrize(
+    "rot, rotMat, axes",
+    [(rotx, rotxMat, (1, 2)), (roty, rotyMat, (2, 0)), (rotz, rotzMat, (0, 1))],
+)
+def test_batched_rotations(rot, rotMat, axes):
+    theta = np.array([0, 0.3, np.pi / 2, -2.0])
+    v = np.random.default_rng(1).normal(size=(4, 3))
+    i, j = axes
+    for t, m in zip(theta, rotMat(theta)):
+        e = np.eye(3)[i]
+        assert np.allclose(m, rotMat(t))
+        assert np.allclose(np.dot(m, e), np.cos(t) * e + np.sin(t) * np.eye(3)[j])
+        assert np.isclose(np.linalg.det(m), 1)
+    expected = np.array([np.dot(rotMat(t), w) for t, w in zip(theta, v)])
+    assert np.allclose(rot(theta, v), expected)
+    assert np.allclose([rot(t, w) for t, w in zip(theta, v)], expected)
+    assert rot(theta[:, np.newaxis], v[np.newaxis]).shape == (4, 4, 3)
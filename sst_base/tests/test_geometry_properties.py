@@ -0,0 +1,158 @@
+"""
+Randomized invariants of the geometry stack. Each test draws its frames
+and points from a seeded generator, so failures are reproducible, and
+checks properties that must hold for any geometry rather than fixed
+numbers: transforms invert each other, and scalar and batched paths agree.
+"""
+
+import pytest
+import numpy as np
+
+from sst_base.geometry.frames import Frame, Panel, Interval
+from sst_base.geometry.linalg import rotz, rotzMat
+from sst_base.geometry.polygons import (
+    clipPolygons,
+    isInPoly,
+    isInPolygon,
+    polygonAreas,
+    getMinDist,
+    getMinDists,
+)
+
+SEEDS = range(8)
+
+
+def random_points(rng):
+    """
+    Three points that define a well-conditioned, non-vertical basis
+    """
+    p1 = rng.uniform(-20, 20, 3)
+    n2 = rng.normal(size=3)
+    n2 /= np.linalg.norm(n2)
+    n3 = np.cross(n2, rng.normal(size=3))
+    n3 /= np.linalg.norm(n3)
+    return p1, p1 + n2, p1 + np.cross(n2, n3)
+
+
+def random_frame(rng, depth=None):
+    """
+    Panel at the bottom of a random chain of up to three parent frames
+    """
+    if depth is None:
+        depth = rng.integers(0, 4)
+    parent = None
+    for _ in range(depth):
+        parent = Frame(*random_points(rng), parent=parent)
+    width, height = rng.uniform(1, 30, 2)
+    return Panel(*random_points(rng), width=width, height=height, parent=parent)
+
+
+def random_poses(rng, n):
+    x, y, z = rng.uniform(-30, 30, (3, n))
+    r = rng.uniform(-180, 180, n)
+    return x, y, z, r
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("origin", ["edge", "center"])
+def test_frame_to_beam_round_trip(seed, origin):
+    rng = np.random.default_rng(seed)
+    frame = random_frame(rng)
+    for fx, fy, fz, fr in zip(*random_poses(rng, 10)):
+        pose = frame.frame_to_beam(fx, fy, fz, fr, origin=origin)
+        assert np.allclose(frame.beam_to_frame(*pose, origin=origin), (fx, fy, fz, fr))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_global_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_frame(rng)
+    v = rng.uniform(-10, 10, 3)
+    manip = rng.uniform(-10, 10, 3)
+    r = rng.uniform(-180, 180)
+    v_global = frame.frame_to_global(v, manip, r, rotation="global")
+    assert np.allclose(frame.global_to_frame(v_global, manip, r), v)
+    # Transforms are rigid, so distances are preserved
+    w = rng.uniform(-10, 10, 3)
+    w_global = frame.frame_to_global(w, manip, r, rotation="global")
+    assert np.isclose(np.linalg.norm(v_global - w_global), np.linalg.norm(v - w))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_batched_matches_scalar(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_frame(rng)
+    x, y, z, r = random_poses(rng, 20)
+    batched = frame.frame_to_beam(x, y, z, r)
+    scalar = np.array([frame.frame_to_beam(*p) for p in zip(x, y, z, r)]).T
+    assert np.allclose(batched, scalar)
+
+    distance = frame.distance_to_beam(*batched)
+    assert np.allclose(distance, [frame.distance_to_beam(*p) for p in zip(*batched)])
+
+    v = np.stack([x, y, z], axis=-1)
+    manip = rng.uniform(-10, 10, (20, 3))
+    v_global = frame._frame_to_global_many(v, manip, r)
+    expected = [frame.frame_to_global(*p, rotation="global") for p in zip(v, manip, r)]
+    assert np.allclose(v_global, expected)
+    assert np.allclose(frame._global_to_frame_many(v_global, manip, r), v)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_distance_sign(seed):
+    """
+    Points of the panel placed in the beam are on it, and points pushed
+    out past an edge within the panel plane are off it
+    """
+    rng = np.random.default_rng(seed)
+    frame = random_frame(rng)
+    fx = rng.uniform(0.05, 0.95, 10) * frame.width
+    fy = rng.uniform(0.05, 0.95, 10) * frame.height
+    r = rng.uniform(10, 170, 10)
+    inside = frame.distance_to_beam(*frame.frame_to_beam(fx, fy, 0, r))
+    assert np.all(inside <= 0)
+    outside = frame.distance_to_beam(*frame.frame_to_beam(fx + frame.width, fy, 0, r))
+    assert np.all(outside >= 0)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_interval_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    parent = Interval(rng.uniform(-10, 10), rng.uniform(50, 100))
+    interval = parent.make_sample_frame(sorted(rng.uniform(0, 50, 2)))
+    x = rng.uniform(-100, 100, 20)
+    for origin in ["edge", "center"]:
+        assert np.allclose(interval.beam_to_frame(interval.frame_to_beam(x, origin=origin), origin=origin), x)
+    assert np.allclose(interval.distance_to_beam(x), [interval.distance_to_beam(v) for v in x])
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_rotation_properties(seed):
+    rng = np.random.default_rng(seed)
+    theta = rng.uniform(-np.pi, np.pi, 10)
+    v = rng.normal(size=(10, 3))
+    m = rotzMat(theta)
+    assert np.allclose(np.einsum("nij,nkj->nik", m, m), np.eye(3))
+    assert np.allclose(rotz(-theta, rotz(theta, v)), v)
+    assert np.allclose(rotz(theta[0], rotz(theta[1], v)), rotz(theta[0] + theta[1], v))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_polygon_routines(seed):
+    rng = np.random.default_rng(seed)
+    # Random convex polygon, from sorted angles around a center
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 7))
+    outline = np.stack([np.cos(angles), np.sin(angles)], axis=-1) * rng.uniform(1, 5)
+    points = rng.uniform(-6, 6, (50, 2))
+    inside = isInPolygon(points, outline)
+    assert np.all(inside == [isInPoly(p, *outline) for p in points])
+    assert np.allclose(getMinDists(points, outline), [getMinDist(p, *outline) for p in points])
+
+    x, y = outline.T
+    shoelace = 0.5 * np.abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    assert np.isclose(polygonAreas(outline), shoelace)
+    squares = rng.uniform(-3, 3, (20, 1, 2)) + np.array([(0, 0), (1, 0), (1, 1), (0, 1)])
+    clipped = polygonAreas(clipPolygons(squares, outline))
+    assert np.all(clipped <= 1 + 1e-9)
+    corners_inside = np.all(isInPolygon(squares.reshape(-1, 2), outline).reshape(20, 4), axis=-1)
+    assert np.allclose(clipped[corners_inside], 1)
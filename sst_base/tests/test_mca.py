@@ -0,0 +1,111 @@
+import numpy as np
+from ophyd import Component as Cpt, Signal
+
+from sst_base.detectors.mca import EpicsMCABase
+
+
+class SoftMCA(EpicsMCABase):
+    exposure_time = Cpt(Signal, value=1, kind="config")
+    counts = Cpt(Signal, value=0, kind="hinted")
+    acquire = Cpt(Signal, value=0, kind="omitted")
+    spectrum = Cpt(Signal, value=np.zeros(0), kind="normal")
+    llim = Cpt(Signal, value=0, kind="config")
+    ulim = Cpt(Signal, value=100, kind="config")
+    nbins = Cpt(Signal, value=100, kind="config")
+    energies = Cpt(Signal, value=np.arange(100) + 0.5, kind="config")
+    make_cal = Cpt(Signal, value=0, kind="omitted")
+
+
+def naive_read(mca, spectrum):
+    full = np.zeros(mca.nbins.get())
+    full[: min(len(spectrum), len(full))] = spectrum[: len(full)]
+    e = mca.energies.get()
+    return full, {
+        mca.name + "_" + roi: np.sum(full[e.searchsorted(lo, "left"):e.searchsorted(hi, "right")])
+        for roi, (lo, hi) in mca.rois.items()
+    }
+
+
+def test_roi_sums_match_searchsorted():
+    rng = np.random.default_rng(0)
+    mca = SoftMCA("", name="mca")
+    mca.set_roi("low", 10, 20)
+    mca.set_roi("high", 50.2, 99)
+    mca.set_roi("empty", 30.1, 30.2)
+    mca.set_roi("outside", 150, 200)
+    mca.set_roi("all", -10, 500)
+    mca.set_roi("reversed", 40, 30)
+    for length in (100, 60, 120):
+        spectrum = rng.integers(0, 1000, length)
+        mca.spectrum.put(spectrum)
+        r = mca.read()
+        full, expected = naive_read(mca, spectrum)
+        assert np.array_equal(r["mca_spectrum"]["value"], full)
+        for key, value in expected.items():
+            assert r[key]["value"] == value
+        assert r["mca_reversed"]["value"] == 0
+
+
+def test_roi_table_follows_energies_and_rois():
+    mca = SoftMCA("", name="mca")
+    mca.spectrum.put(np.ones(100))
+    mca.set_roi("a", 0, 9)
+    assert mca.read()["mca_a"]["value"] == 9
+    table = mca._roi_table
+    mca.read()
+    assert mca._roi_table is table
+    # A new energy axis moves the ROI
+    mca.energies.put(np.arange(100) * 0.5)
+    assert mca._roi_table is None
+    assert mca.read()["mca_a"]["value"] == 19
+    mca.set_roi("b", 10, 11)
+    r = mca.read()
+    assert r["mca_b"]["value"] == 3
+    mca.clear_roi("a")
+    r = mca.read()
+    assert "mca_a" not in r and r["mca_b"]["value"] == 3
+
+
+def test_describe_and_read_use_config_cache():
+    mca = SoftMCA("", name="mca")
+    mca.set_roi("a", 0, 9)
+    mca.spectrum.put(np.ones(100))
+    mca.stage()
+    try:
+        calls = []
+        for attr in ("nbins", "energies"):
+            sig = getattr(mca, attr)
+            get = sig.get
+
+            def counted(*args, _get=get, _attr=attr, **kwargs):
+                calls.append(_attr)
+                return _get(*args, **kwargs)
+
+            sig.get = counted
+        assert mca.describe()["mca_spectrum"]["shape"] == [100]
+        assert len(mca.read()["mca_spectrum"]["value"]) == 100
+        assert calls == []
+        # Monitor updates refresh the cache
+        mca.nbins.put(120)
+        assert mca.describe()["mca_spectrum"]["shape"] == [120]
+        assert len(mca.read()["mca_spectrum"]["value"]) == 120
+        assert calls == []
+    finally:
+        mca.unstage()
+
+
+def test_roi_indices_survive_concurrent_reset():
+    mca = SoftMCA("", name="mca")
+    mca.set_roi("low", 10, 20)
+    config_value = mca._config_value
+
+    def _reset_while_building(attr):
+        # As if an energies update arrived while the table was being built
+        value = config_value(attr)
+        mca._roi_table = None
+        return value
+
+    mca._config_value = _reset_while_building
+    keys, i1, i2 = mca._roi_indices()
+    assert keys == ["mca_low"]
+    assert (i1[0], i2[0]) == (10, 20)
@@ -0,0 +1,513 @@
+import copy
+import json
+import pickle
+import msgpack
+import pytest
+import numpy as np
+
+from sst_base.sampleholder import SampleHolder, SampleMetadata, make_regular_polygon, make_1d_bar
+from sst_base.geometry.frames import Panel
+from sst_base.geometry.linalg import vec, deg_to_rad
+from sst_base.snapshot import diff_snapshots
+
+
+@pytest.fixture
+def bar():
+    """
+    Four-sided bar with a couple of samples loaded
+    """
+    geometry = make_regular_polygon(19.5, 130, 4)
+    holder = SampleHolder(name="bar", geometry=geometry, table_angles=[0, 20, 45, 90])
+    holder.add_sample("s1", "sample 1", (1, 2, 5, 8), 1)
+    holder.add_sample("s2", "sample 2", (3, 10, 10, 30), 2, t=0.5)
+    holder.add_sample("s3", "sample 3", (2, 40, 12, 55), 4)
+    return holder
+
+
+@pytest.mark.parametrize("origin", ["edge", "center"])
+def test_coordinate_table_matches_frame_to_beam(bar, origin):
+    sample_ids, coordinates = bar.coordinate_table(origin)
+    assert coordinates.shape == (len(sample_ids), len(bar.table_angles), 4)
+    for i, sample_id in enumerate(sample_ids):
+        frame = bar.sample_frames[sample_id]
+        for j, angle in enumerate(bar.table_angles):
+            expected = frame.frame_to_beam(0, 0, 0, angle, origin=origin)
+            assert np.allclose(coordinates[i, j], expected)
+
+
+def test_coordinate_table_skips_null_frame(bar):
+    sample_ids, _ = bar.coordinate_table()
+    assert "null" not in sample_ids
+    assert "s1" in sample_ids
+
+
+def test_coordinate_table_invalidated(bar):
+    sample_ids, coordinates = bar.coordinate_table()
+    assert bar.coordinate_table()[1] is coordinates
+    bar.add_sample("s4", "sample 4", (0, 0, 1, 1), 3)
+    sample_ids, coordinates = bar.coordinate_table()
+    assert "s4" in sample_ids
+    bar.set_table_angles([10])
+    assert bar.coordinate_table()[1].shape == (len(sample_ids), 1, 4)
+
+
+def _iterative_regular_polygon(width, height, nsides, points=None, parent=None, invert=True):
+    """
+    The original side-by-side construction, kept as a reference
+    """
+    geometry = []
+    interior_angle = deg_to_rad(360.0 / nsides)
+    if invert:
+        az = -1
+    else:
+        az = 1
+
+    if points is None:
+        y = -1 * az * width / 2.0
+        x = width / (2.0 * np.tan(interior_angle / 2.0))
+        if invert:
+            z = height
+        else:
+            z = 0
+        p1 = vec(x, y, z)
+        p2 = p1 + vec(0, 0, az)
+        p3 = p1 + vec(0, az, 0)
+    else:
+        p1, p2, p3 = points
+
+    def _newSideFromSide(side):
+        prev_edges = side.real_edges(vec(0, 0, 0), 0)
+        new_vector = vec(np.cos(np.pi - interior_angle), 0, -np.sin(np.pi - interior_angle))
+        p1 = prev_edges[1]
+        p2 = prev_edges[2]
+        p3 = side.frame_to_global(new_vector + side.edges[1], r=0, rotation="global")
+        return Panel(p1, p2, p3, width=width, height=height, parent=parent)
+
+    current_side = Panel(p1, p2, p3, width=width, height=height, parent=parent)
+    geometry.append(current_side)
+    new_sides = []
+    for n in range(1, nsides):
+        new_side = _newSideFromSide(current_side)
+        new_sides.append(new_side)
+        current_side = new_side
+    geometry += new_sides[::-1]
+    return geometry
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"width": 1, "height": 1},
+        {"width": 24.5, "height": 215},
+        {"width": 24.5, "height": 215, "invert": False},
+        {"width": 1, "height": 10, "points": (vec(0.5, -0.5, 0), vec(0.5, -0.5, 1), vec(0.5, 0.5, 0))},
+        {"width": 2, "height": 10, "points": (vec(1, 0.3, 0), vec(1.1, 0.3, 1), vec(1, 2.3, 0.1))},
+    ],
+)
+def test_regular_polygon_parity(kwargs):
+    expected = _iterative_regular_polygon(nsides=4, **kwargs)
+    sides = make_regular_polygon(nsides=4, **kwargs)
+    for side, ref in zip(sides, expected):
+        assert np.allclose(side.p0, ref.p0)
+        assert np.allclose(side.A, ref.A)
+        assert np.isclose(side.r0, ref.r0)
+
+
+@pytest.mark.parametrize("nsides", [3, 5, 6, 8])
+def test_regular_polygon_closes(nsides):
+    width = 10
+    sides = make_regular_polygon(width, 100, nsides)
+    for n, side in enumerate(sides):
+        following = sides[(n + 1) % nsides]
+        assert np.allclose(following.frame_to_global(vec(width, 0, 0), rotation="global"), side.p0)
+        assert np.isclose(np.hypot(side.p0[0], side.p0[1]), width / (2 * np.sin(np.pi / nsides)))
+
+
+def _crossing_pose(side, x, y, r):
+    """
+    Beam-centered manipulator pose that puts side frame point (x, y, 0)
+    into the beam at rotation r
+    """
+    p = side.frame_to_global(vec(x, y, 0), rotation="global")
+    theta = deg_to_rad(r)
+    c, s = np.cos(theta), np.sin(theta)
+    return [-(c * p[0] + s * p[1]), -(c * p[1] - s * p[0]), -p[2], r]
+
+
+def test_fit_alignment_recovers_shifted_bar():
+    width = 24.5
+    measured = SampleHolder(name="measured", geometry=make_regular_polygon(width, 215, 4))
+    shift = vec(0.3, -0.2, 0)
+    tilt = vec(0.002, 0.001, 0)
+    for n, side in enumerate(measured.sides):
+        p0 = side.p0 + shift
+        measured.update_side(n, p0, p0 + side.A[:, 1] + tilt, p0 + side.A[:, 0])
+
+    rng = np.random.default_rng(0)
+    poses = []
+    edge_ids = []
+    for n, side in enumerate(measured.sides):
+        for edge in (0, 1):
+            for y in rng.uniform(0, 200, 5):
+                pose = _crossing_pose(side, edge * width, y, rng.uniform(0, 360))
+                pose[1] += rng.uniform(-3, 3)
+                poses.append(pose)
+                edge_ids.append((n + 1, edge))
+
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(width, 215, 4))
+    result = holder.fit_alignment(poses, edge_ids)
+    assert sorted(result["sides"]) == [1, 2, 3, 4]
+    assert np.allclose(result["residuals"], 0)
+    for n, side in enumerate(holder.sides):
+        assert np.isclose(result["width"][n + 1], width)
+        assert np.allclose(side.A, measured.sides[n].A)
+        assert np.isclose(side.r0, measured.sides[n].r0)
+        # Edges along the bar only fix the origin up to a shift along the bar
+        d = side.p0 - measured.sides[n].p0
+        assert np.allclose(d - np.dot(d, side.A[:, 1]) * side.A[:, 1], 0)
+
+
+def _crossings(holder, width, rng, nper=5, dy=3.0, shift=vec(0, 0, 0)):
+    """
+    Crossings of every edge at random heights and rotations, with the
+    manipulator moved along the beam by up to dy, for a holder shifted by
+    shift
+    """
+    poses = []
+    edge_ids = []
+    for n, side in enumerate(holder.sides):
+        for edge in (0, 1):
+            for y in rng.uniform(0, 200, nper):
+                pose = _crossing_pose(side, edge * width, y, rng.uniform(0, 360))
+                theta = deg_to_rad(pose[3])
+                # A holder shifted by shift needs the manipulator moved by
+                # the shift, rotated into the beam frame
+                pose[0] -= np.cos(theta) * shift[0] + np.sin(theta) * shift[1]
+                pose[1] -= np.cos(theta) * shift[1] - np.sin(theta) * shift[0]
+                pose[2] -= shift[2]
+                # Moving along the beam keeps the beam on the edge
+                pose[1] += rng.uniform(-dy, dy)
+                poses.append(pose)
+                edge_ids.append((n + 1, edge))
+    return poses, edge_ids
+
+
+def test_fit_alignment_ignores_position_along_beam():
+    width = 24.5
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(width, 215, 4))
+    nominal = [(side.p0.copy(), side.A.copy()) for side in holder.sides]
+    poses, edge_ids = _crossings(holder, width, np.random.default_rng(1))
+    result = holder.fit_alignment(poses, edge_ids)
+    assert np.allclose(result["offset"], 0, atol=1e-9)
+    assert np.allclose(list(result["width"].values()), width)
+    assert np.allclose(result["residuals"], 0, atol=1e-9)
+    for side, (p0, A) in zip(holder.sides, nominal):
+        assert np.allclose(side.A, A)
+        d = side.p0 - p0
+        assert np.allclose(d - np.dot(d, side.A[:, 1]) * side.A[:, 1], 0)
+
+
+def test_fit_alignment_offset():
+    width = 24.5
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(width, 215, 4))
+    shift = vec(0.3, -0.2, 0)
+    poses, edge_ids = _crossings(holder, width, np.random.default_rng(2), shift=shift)
+    result = holder.fit_alignment(poses, edge_ids, update=False)
+    assert np.allclose(result["offset"], shift)
+    assert np.allclose(list(result["width"].values()), width)
+    assert np.allclose(result["residuals"], 0, atol=1e-9)
+
+
+def test_fit_alignment_updates_width():
+    width = 24.5
+    measured = SampleHolder(name="measured", geometry=make_regular_polygon(width, 215, 4))
+    measured.sides[1].set_width(25)
+    rng = np.random.default_rng(3)
+    poses = []
+    edge_ids = []
+    for n, side in enumerate(measured.sides):
+        for edge in (0, 1):
+            for y in rng.uniform(0, 200, 5):
+                poses.append(_crossing_pose(side, edge * side.width, y, rng.uniform(0, 360)))
+                edge_ids.append((n + 1, edge))
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(width, 215, 4))
+    result = holder.fit_alignment(poses, edge_ids)
+    assert np.isclose(result["width"][2], 25)
+    assert np.allclose([side.width for side in holder.sides], [width, 25, width, width])
+    assert np.allclose(holder.sides[1].edges[2][:2], (25, 215))
+    again = holder.fit_alignment(poses, edge_ids)
+    assert np.allclose(again["residuals"], 0, atol=1e-9)
+
+
+def test_fit_alignment_needs_panels():
+    holder = SampleHolder(name="bar1d", geometry=make_1d_bar(100))
+    with pytest.raises(ValueError, match="Panel"):
+        holder.fit_alignment([(0, 0, 0, 0)] * 3, [(1, 0)] * 3)
+
+
+def test_beam_footprint_grazing(bar):
+    fr = np.array([90, 30, 10, 1])
+    footprint, overlap, neighbors = bar.beam_footprint("s2", 3.5, 10, fr, (0.2, 0.1))
+    assert footprint.shape == (4, 4, 2)
+    assert np.allclose(np.mean(footprint, axis=-2), [3.5, 10])
+    assert np.allclose(np.ptp(footprint[..., 0], axis=-1), 0.2 / np.sin(np.deg2rad(fr)))
+    # The sample is 7 wide, so the footprint spills off at 1 degree only
+    assert np.allclose(overlap[:3], 1)
+    assert 0 < overlap[3] < 1
+    assert neighbors == {}
+
+
+def test_beam_footprint_neighbors(bar):
+    bar.add_sample("s5", "sample 5", (10, 10, 15, 30), 2)
+    footprint, overlap, neighbors = bar.beam_footprint("s2", 0, 0, [90, 1], (0.2, 0.1), origin="center")
+    assert np.isclose(overlap[0], 1)
+    assert neighbors["s5"][0] == 0
+    assert 0 < neighbors["s5"][1] < 1 - overlap[1]
+
+
+def _sample_rows(n):
+    return [
+        {"sample_id": f"bulk{i}", "name": f"bulk {i}", "position": (1, i, 5, i + 4), "side": i % 4 + 1, "cas": i}
+        for i in range(n)
+    ]
+
+
+def test_add_samples_bulk(bar):
+    calls = []
+    bar.subscribe(lambda **kwargs: calls.append(kwargs["samples"]), event_type=bar.SUB_SAMPLES, run=False)
+    rows = _sample_rows(40)
+    bar.add_samples(rows)
+    assert len(calls) == 1
+    assert all(row["sample_id"] in bar.samples for row in rows)
+    bar.set("bulk5")
+    md = bar.current_sample_md()
+    assert md["name"] == "bulk 5"
+    assert md["side"] == 2
+    assert md["cas"] == 5
+    expected = bar.sides[1].make_sample_frame((1, 5, 5, 9)).frame_to_beam(0, 0, 0, 45)
+    assert np.allclose(bar.frame_to_beam(0, 0, 0, 45), expected)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"side": 5},
+        {"side": 0},
+        {"position": (1, 2, 1, 5)},
+        {"position": (1, 2, 3)},
+        {"position": (1, np.nan, 3, 4)},
+        {"sample_id": "bulk0"},
+    ],
+)
+def test_add_samples_validates_all_first(bar, change):
+    rows = _sample_rows(10)
+    rows[7].update(change)
+    nsamples = len(bar.samples)
+    with pytest.raises(ValueError):
+        bar.add_samples(rows)
+    assert len(bar.samples) == nsamples
+
+
+def test_clear_samples_resets_stores(bar):
+    for _ in range(3):
+        bar.clear_samples()
+        bar.add_samples(_sample_rows(100))
+    assert sum(side.sample_store.size for side in bar.sides) == 100
+    frame = bar.sample_frames["bulk0"]
+    p0 = frame.p0.copy()
+    bar.clear_samples()
+    bar.add_sample("s1", "sample 1", (7, 7, 9, 9), 1)
+    assert np.allclose(frame.p0, p0)
+
+
+def test_snapshot_round_trip(bar, tmp_path):
+    bar.add_samples(_sample_rows(20))
+    bar.set("s2")
+    filename = tmp_path / "bar.npz"
+    bar.save_snapshot(filename)
+
+    calls = []
+    holder = SampleHolder(name="restored")
+    holder.subscribe(lambda **kwargs: calls.append(kwargs["samples"]), event_type=holder.SUB_SAMPLES, run=False)
+    holder.load_snapshot(filename)
+    assert len(calls) == 1
+    assert sorted(holder.samples) == sorted(bar.samples)
+    assert holder.current_sample_md() == bar.current_sample_md()
+    assert holder.sample_md["bulk3"]["cas"] == 3
+    for angle in (0, 30, 90):
+        assert np.allclose(holder.frame_to_beam(1, 2, 0, angle), bar.frame_to_beam(1, 2, 0, angle))
+    ids, table = holder.coordinate_table()
+    ref_ids, ref_table = bar.coordinate_table()
+    assert np.allclose(table, ref_table[[ref_ids.index(i) for i in ids]])
+    holder.add_sample("new", "new", (0, 0, 1, 1), 1)
+    assert np.allclose(holder.sample_frames["s1"].p0, bar.sample_frames["s1"].p0)
+
+
+def test_snapshot_metadata_types(bar, tmp_path):
+    spectrum = np.linspace(0, 1, 6).reshape(2, 3)
+    bar.add_sample(
+        "s4", "sample 4", (0, 0, 1, 1), 3, spectrum=spectrum, tags={"a", "b"}, shape=(1, (2, 3)), n=np.int64(4)
+    )
+    bar.save_snapshot(tmp_path / "bar.npz")
+    holder = SampleHolder(name="restored")
+    holder.load_snapshot(tmp_path / "bar.npz")
+    md = holder.sample_md["s4"]
+    assert isinstance(md["spectrum"], np.ndarray)
+    assert md["spectrum"].dtype == spectrum.dtype
+    assert np.array_equal(md["spectrum"], spectrum)
+    assert md["tags"] == {"a", "b"}
+    assert md["shape"] == (1, (2, 3))
+    assert md["n"] == 4
+    assert diff_snapshots(tmp_path / "bar.npz", tmp_path / "bar.npz")["metadata"] == []
+    bar.update_sample_md("s1", handle=object())
+    with pytest.raises(ValueError):
+        bar.save_snapshot(tmp_path / "bad.npz")
+
+
+def test_snapshot_round_trip_1d(tmp_path):
+    holder = SampleHolder(name="bar1d", geometry=make_1d_bar(100))
+    holder.add_samples(
+        [
+            {"sample_id": "s1", "name": "sample 1", "position": (10, 20), "side": 1},
+            {"sample_id": "s2", "name": "sample 2", "position": (35, 30), "side": 1, "cas": 2},
+        ]
+    )
+    holder.update_side(0, 5)
+    holder.set("s2")
+    holder.save_snapshot(tmp_path / "a.npz")
+    restored = SampleHolder(name="restored")
+    restored.load_snapshot(tmp_path / "a.npz")
+    assert sorted(restored.samples) == sorted(holder.samples)
+    assert restored.current_sample_md() == holder.current_sample_md()
+    for sample_id in ("s1", "s2"):
+        restored.set(sample_id)
+        holder.set(sample_id)
+        for x in (0, 2.5):
+            assert np.isclose(restored.frame_to_beam(x), holder.frame_to_beam(x))
+    holder.add_sample("s3", "sample 3", (50, 60), 1)
+    holder.update_side(0, 6)
+    holder.save_snapshot(tmp_path / "b.npz")
+    diff = diff_snapshots(tmp_path / "a.npz", tmp_path / "b.npz")
+    assert diff["sides"] == [0]
+    assert diff["added"] == ["s3"]
+    assert diff["moved"] == []
+
+
+def test_snapshot_diff(bar, tmp_path):
+    bar.save_snapshot(tmp_path / "a.npz")
+    bar.add_sample("s4", "sample 4", (0, 0, 1, 1), 3)
+    side = bar.sides[1]
+    bar.update_side(1, side.p0 + vec(0.1, 0, 0), side.p0 + side.A[:, 1], side.p0 + side.A[:, 0])
+    bar.update_sample_md("s1", name="renamed")
+    bar.save_snapshot(tmp_path / "b.npz")
+    diff = diff_snapshots(tmp_path / "a.npz", tmp_path / "b.npz")
+    assert diff["sides"] == [1]
+    assert diff["added"] == ["s4"]
+    assert diff["removed"] == []
+    assert diff["moved"] == []
+    assert diff["metadata"] == ["s1"]
+
+
+def test_snapshot_refuses_rotated_sample(bar, tmp_path):
+    frame = bar.sample_frames["s1"]
+    frame.update_basis(frame.p0, frame.p0 + vec(0.1, 1, 0), frame.p0 + vec(1, 0, 0))
+    with pytest.raises(ValueError):
+        bar.save_snapshot(tmp_path / "bar.npz")
+
+
+def test_sample_metadata_is_frozen(bar):
+    bar.add_sample("s4", "sample 4", (0, 0, 1, 1), 3, composition={"Fe": [1, 2]}, shape=(1, 2))
+    md = bar.sample_md["s4"]
+    assert isinstance(md, SampleMetadata)
+    with pytest.raises(TypeError):
+        md["name"] = "other"
+    with pytest.raises(TypeError):
+        md["composition"]["Fe"] = 3
+    assert md["composition"]["Fe"] == (1, 2)
+    thawed = md.to_dict()
+    thawed["composition"]["Fe"].append(3)
+    assert md["composition"]["Fe"] == (1, 2)
+    assert thawed["shape"] == (1, 2)
+
+
+def test_current_sample_md_serializes(bar):
+    bar.add_sample("s4", "sample 4", (0, 0, 1, 1), 3, composition={"Fe": [1, {"ox": [2, 3]}]})
+    bar.set("s4")
+    md = bar.current_sample_md()
+    assert type(md) is dict
+    assert md["composition"] == {"Fe": [1, {"ox": [2, 3]}]}
+    assert json.loads(json.dumps(md)) == md
+    assert msgpack.unpackb(msgpack.packb(md)) == md
+    assert copy.deepcopy(md) == md
+    md.update(name="changed")
+    assert bar.current_sample_md()["name"] == "sample 4"
+    # The plain form is made once per version
+    assert bar.current_sample_md()["composition"] is md["composition"]
+    bar.update_sample_md("s4", composition={"Fe": [2]})
+    assert bar.current_sample_md()["composition"] == {"Fe": [2]}
+    record = bar.sample_md["s4"]
+    for restored in (pickle.loads(pickle.dumps(record)), copy.deepcopy(record)):
+        assert isinstance(restored, SampleMetadata)
+        assert restored.to_dict() == record.to_dict()
+
+
+def test_update_sample_md(bar):
+    bar.set("s1")
+    md = bar.sample_md["s1"]
+    bar.update_sample_md("s1", name="renamed", description="new")
+    new = bar.sample_md["s1"]
+    assert new.version > md.version
+    assert md["name"] == "sample 1"
+    assert new["name"] == "renamed"
+    assert bar.sample.sample_name.get() == "renamed"
+    with pytest.raises(ValueError):
+        bar.update_sample_md("s1", side=2)
+
+
+def test_update_side_1d():
+    holder = SampleHolder(name="bar1d", geometry=make_1d_bar(100))
+    holder.add_sample("s1", "sample 1", (10, 20), 1)
+    holder.update_side(0, 5)
+    holder.set("s1")
+    assert np.isclose(holder.frame_to_beam(0), 15)
+
+
+def test_add_samples_1d():
+    holder = SampleHolder(name="bar1d", geometry=make_1d_bar(100))
+    holder.add_samples(
+        [
+            {"sample_id": "s1", "name": "sample 1", "position": (10, 20), "side": 1},
+            {"sample_id": "s2", "name": "sample 2", "position": (30, 35), "side": 1, "cas": 2},
+        ]
+    )
+    holder.set("s2")
+    assert np.isclose(holder.frame_to_beam(0), 30)
+    assert holder.sample_md["s2"]["cas"] == 2
+    with pytest.raises(ValueError, match="x1, x2"):
+        holder.add_samples([{"sample_id": "s3", "name": "sample 3", "position": (1, 2, 3, 4), "side": 1}])
+    with pytest.raises(ValueError):
+        holder.add_samples([{"sample_id": "s3", "name": "sample 3", "position": (5, 5), "side": 1}])
+    assert "s3" not in holder.samples
+
+
+def test_beam_footprint_holes_and_concave_outline():
+    window = Panel(
+        vec(0, 0, 0), vec(0, 0, 1), vec(1, 0, 0), width=10, height=10, holes=[[(4, 4), (6, 4), (6, 6), (4, 6)]]
+    )
+    # L-shaped panel, missing the upper right quarter
+    ell = Panel(
+        vec(0, 0, 0),
+        vec(0, 0, 1),
+        vec(1, 0, 0),
+        width=10,
+        height=10,
+        outline=[(0, 0), (10, 0), (10, 5), (5, 5), (5, 10), (0, 10)],
+    )
+    for geometry, fx, fy, expected in [
+        (window, [5, 4, 2], [5, 5, 2], [0, 0.5, 1]),
+        (ell, [5, 7.5, 2], [5, 7.5, 2], [0.75, 0, 1]),
+    ]:
+        holder = SampleHolder(name="holder", geometry=[geometry])
+        footprint, overlap, _ = holder.beam_footprint("side1", np.array(fx), np.array(fy), 90, (1, 1))
+        assert np.allclose(np.ptp(footprint, axis=-2), 1)
+        assert np.allclose(overlap, expected)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from sst_base.sampleholder import SampleHolder, make_regular_polygon
+from sst_base.sampleorder import optimize_order, order_holder_samples, path_time, travel_time_matrix
+
+
+def test_optimize_order_line():
+    """
+    Points on a line should be visited monotonically
+    """
+    x = np.array([5, 1, 4, 2, 3, 0], dtype=float)
+    coordinates = np.vstack([x, np.zeros_like(x)]).T
+    order, time_saved = optimize_order(coordinates, (1, 1), start=(0, 0))
+    assert np.all(x[order] == np.arange(6))
+    times = travel_time_matrix(coordinates, (1, 1))
+    start_times = np.abs(x)
+    assert np.isclose(time_saved, path_time(times, np.arange(6), start_times) - 5)
+
+
+def test_optimize_order_never_worse():
+    rng = np.random.default_rng(0)
+    coordinates = rng.uniform(0, 100, (25, 3))
+    sides = rng.integers(1, 5, 25)
+    order, time_saved = optimize_order(coordinates, (2, 1, 1), sides, side_change_time=5)
+    assert sorted(order) == list(range(25))
+    assert time_saved >= 0
+
+
+def test_order_holder_samples():
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(24.5, 215, 4))
+    sample_ids = []
+    for n, (side, y) in enumerate([(1, 150), (2, 10), (1, 10), (2, 150), (1, 80)]):
+        holder.add_sample(f"s{n}", f"s{n}", (2, y, 8, y + 5), side)
+        sample_ids.append(f"s{n}")
+    ordered, time_saved = order_holder_samples(holder, sample_ids, (1, 1, 1, 5), side_change_time=10)
+    assert sorted(ordered) == sorted(sample_ids)
+    assert time_saved > 0
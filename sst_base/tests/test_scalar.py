@@ -0,0 +1,583 @@
+import pytest
+import threading
+import time
+import numpy as np
+from ophyd import Component as Cpt, Signal
+
+from sst_base.detectors.scalar import ScalarBase, ScalarChannel, MultiScalarBase, ScalarDispatcher
+from sst_base.detectors.statistics import P2Quantile, StreamingStats, robust_mask
+
+
+class SoftScalar(ScalarBase):
+    target = Cpt(Signal, value=0, kind="omitted")
+
+
+class SoftChannel(ScalarChannel):
+    target = Cpt(Signal, value=0, kind="omitted")
+
+
+class SoftMulti(MultiScalarBase):
+    i0 = Cpt(SoftChannel, "", kind="hinted")
+    i1 = Cpt(SoftChannel, "", kind="hinted")
+
+
+def _feed(det, values, delay=0.0):
+    """
+    Put values into the target from another thread, as monitor updates
+    would arrive
+    """
+
+    def _run():
+        for v in values:
+            det.target.put(v)
+            time.sleep(delay)
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_trigger_applies_cached_calibration():
+    det = SoftScalar(name="det", rescale=2, retain_samples=True)
+    det.offset.put(1)
+    det.set_exposure(0.2)
+    det.stage()
+    try:
+        status = det.trigger()
+        _feed(det, [1, 2, 3, 4], 0.01).join()
+        status.wait(timeout=5)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 4
+    assert np.isclose(det.mean.get(), np.mean([1, 3, 5, 7]))
+    assert np.isclose(det.sum.get(), 16)
+    assert np.allclose(det._secret_buffer[0], [1, 3, 5, 7])
+
+
+def test_collect_calibrates_flyer_samples():
+    det = SoftScalar(name="det", rescale=10)
+    det.kickoff().wait(timeout=5)
+    for v in range(5):
+        det.target.put(v)
+    first = list(det.collect())
+    for v in range(5, 2000):
+        det.target.put(v)
+    det.complete().wait(timeout=5)
+    rest = list(det.collect())
+    assert [e["data"]["det"] for e in first] == [10 * v for v in range(5)]
+    assert len(first) + len(rest) == 2000
+    assert rest[-1]["data"]["det"] == 19990
+    assert all(e["time"] == e["timestamps"]["det"] for e in rest)
+
+
+def test_trigger_finishes_on_max_points():
+    det = SoftScalar(name="det")
+    det.set_exposure(10)
+    det.max_points.put(3)
+    det.stage()
+    try:
+        t0 = time.monotonic()
+        status = det.trigger()
+        for v in [1, 2, 3]:
+            det.target.put(v)
+        status.wait(timeout=1)
+        assert time.monotonic() - t0 < 1
+    finally:
+        det.unstage()
+    assert det.npts.get() == 3
+    assert np.isclose(det.mean.get(), 2)
+
+
+def test_trigger_finishes_on_sample_timestamps():
+    det = SoftScalar(name="det")
+    det.set_exposure(10)
+    det.stage()
+    try:
+        status = det.trigger()
+        start = time.time()
+        for n, v in enumerate([1, 2, 3, 100]):
+            det.target.put(v, timestamp=start + 4 * n)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    # The sample stamped after the end of the exposure closes the window
+    # but is not part of it
+    assert det.npts.get() == 3
+    assert np.isclose(det.mean.get(), 2)
+
+
+def test_trigger_without_samples():
+    det = SoftScalar(name="det")
+    det.set_exposure(0.05)
+    det.stage()
+    try:
+        det.trigger().wait(timeout=2)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 0
+    assert np.isnan(det.mean.get())
+
+
+def test_deadline_error_fails_status(caplog):
+    det = SoftScalar(name="det")
+    det.set_exposure(0.05)
+    det.stage()
+    try:
+        status = det.trigger()
+
+        def _broken(channel):
+            raise RuntimeError("broken window")
+
+        det._window.has_samples = _broken
+        with pytest.raises(RuntimeError, match="broken window"):
+            status.wait(timeout=2)
+    finally:
+        det.unstage()
+    assert det._window is None
+    # The scheduler logs the error after the status has failed
+    deadline = time.monotonic() + 1
+    while "scheduler" not in caplog.text and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "broken window" in caplog.text
+
+
+def test_retrigger_fails_open_exposure():
+    det = SoftScalar(name="det")
+    det.set_exposure(10)
+    det.max_points.put(2)
+    det.stage()
+    try:
+        first = det.trigger()
+        det.target.put(1)
+        second = det.trigger()
+        with pytest.raises(RuntimeError, match="triggered again"):
+            first.wait(timeout=1)
+        det.target.put(2)
+        det.target.put(4)
+        second.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 2
+    assert np.isclose(det.mean.get(), 3)
+
+
+def test_retrigger_while_samples_stream():
+    det = SoftScalar(name="det", retain_samples=True)
+    det.set_exposure(0.05)
+    stop = threading.Event()
+
+    def _run():
+        v = 0
+        while not stop.is_set():
+            det.target.put(v)
+            v += 1
+
+    det.stage()
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    try:
+        statuses = []
+        for _ in range(50):
+            statuses.append(det.trigger())
+            start = det._window.start
+        statuses[-1].wait(timeout=2)
+    finally:
+        stop.set()
+        thread.join()
+        det.unstage()
+    for status in statuses[:-1]:
+        assert status.done
+    assert statuses[-1].success
+    # Only samples of the last exposure were recorded in it
+    assert np.all(det._secret_time_buffer[-1] >= start)
+    assert len(det._secret_time_buffer[-1]) == det.npts.get()
+
+
+def test_streaming_statistics_match_numpy():
+    rng = np.random.default_rng(0)
+    raw = rng.normal(3, 0.5, 500)
+    det = SoftScalar(name="det", rescale=-2)
+    det.offset.put(0.5)
+    det.set_exposure(10)
+    det.max_points.put(len(raw))
+    det.stage()
+    try:
+        status = det.trigger()
+        for v in raw:
+            det.target.put(v)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    values = raw * -2 - 0.5
+    assert det.npts.get() == len(raw)
+    assert np.isclose(det.mean.get(), np.mean(values))
+    assert np.isclose(det.std.get(), np.std(values))
+    assert np.isclose(det.sum.get(), np.sum(values))
+    assert np.isclose(det.min.get(), np.min(values))
+    assert np.isclose(det.max.get(), np.max(values))
+    assert abs(det.median.get() - np.median(values)) < 0.05
+    assert det._secret_buffer == []
+
+
+def test_streaming_statistics_weights_and_nan():
+    stats = StreamingStats()
+    for x, w in [(1.0, 1.0), (2.0, 3.0), (4.0, 0.0)]:
+        stats.add(x, w)
+    assert stats.sum == 7
+    assert np.isclose(stats.mean, 7 / 4)
+    assert np.isclose(stats.effective_count, 16 / 10)
+    stats = StreamingStats()
+    for x in [np.nan, 3.0, 1.0, 2.0]:
+        stats.add(x)
+    assert stats.count == 4
+    assert stats.min == 1
+    assert stats.max == 3
+
+
+def test_p2_quantile():
+    rng = np.random.default_rng(1)
+    for p in (0.1, 0.5, 0.9):
+        estimate = P2Quantile(p)
+        x = rng.exponential(1, 5000)
+        for v in x[:4]:
+            estimate.add(v)
+        assert np.isclose(estimate.value, np.quantile(x[:4], p))
+        for v in x[4:]:
+            estimate.add(v)
+        assert abs(estimate.value - np.quantile(x, p)) < 0.05
+
+
+@pytest.mark.parametrize("mode", ["sigma_clip", "mad", "trimmed"])
+def test_robust_mode_rejects_glitches(mode):
+    rng = np.random.default_rng(2)
+    raw = rng.normal(10, 0.1, 200)
+    raw[[20, 120]] = [1000, -500]
+    det = SoftScalar(name="det")
+    det.robust_mode.put(mode)
+    det.trim_fraction.put(0.02)
+    det.set_exposure(10)
+    det.max_points.put(len(raw))
+    det.stage()
+    try:
+        status = det.trigger()
+        for v in raw:
+            det.target.put(v)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert abs(det.mean.get() - 10) < 0.05
+    assert det.max.get() < 11
+    assert det.nrejected.get() >= 2
+    assert det.npts.get() + det.nrejected.get() == len(raw)
+
+
+def test_robust_mode_rejects_everything():
+    det = SoftScalar(name="det")
+    det.robust_mode.put("sigma_clip")
+    det.robust_threshold.put(0)
+    det.set_exposure(10)
+    det.max_points.put(4)
+    det.stage()
+    try:
+        status = det.trigger()
+        for v in [1, 2, 3, 5]:
+            det.target.put(v)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 0
+    assert det.nrejected.get() == 4
+    assert np.isnan(det.mean.get())
+    assert np.isnan(det.min.get())
+
+
+def test_publish_error_fails_status():
+    det = SoftScalar(name="det")
+    det.set_exposure(10)
+    det.max_points.put(2)
+
+    def _broken(*args):
+        raise RuntimeError("broken publish")
+
+    det._publish = _broken
+    det.stage()
+    try:
+        status = det.trigger()
+        det.target.put(1)
+        det.target.put(2)
+        with pytest.raises(RuntimeError, match="broken publish"):
+            status.wait(timeout=1)
+    finally:
+        det.unstage()
+
+
+def test_robust_mask_modes():
+    values = np.array([1.0, 1.1, 0.9, 1.0, 50.0, 1.05, np.nan])
+    assert np.all(robust_mask(values, "none") == np.isfinite(values))
+    for mode in ("sigma_clip", "mad"):
+        assert np.all(robust_mask(values, mode, 2) == [True] * 4 + [False, True, False])
+    assert np.count_nonzero(robust_mask(values, "trimmed", fraction=0.2)) == 4
+    with pytest.raises(ValueError):
+        robust_mask(values, "unknown")
+
+
+def test_multi_channel_shared_window():
+    det = SoftMulti(name="multi", retain_samples=True)
+    det.i1.rescale.put(2)
+    det.set_exposure(10)
+    det.stage()
+    try:
+        status = det.trigger()
+        start = time.time()
+        for n, v in enumerate([1, 2, 3, 100]):
+            det.i0.target.put(v, timestamp=start + 4 * n)
+            assert not status.done
+            det.i1.target.put(10 * v, timestamp=start + 4 * n + 1)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert [c.name for c in det.channels] == ["multi_i0", "multi_i1"]
+    assert det.get_plot_hints() == ["multi_i0", "multi_i1"]
+    assert det.i0.npts.get() == 3
+    assert np.isclose(det.i0.mean.get(), 2)
+    assert det.i1.npts.get() == 3
+    assert np.isclose(det.i1.mean.get(), 40)
+    assert np.allclose(det.i1._secret_buffer[0], [20, 40, 60])
+    assert "multi_i0" in det.read() and "multi_i1" in det.read()
+
+
+def test_multi_channel_deadline_and_collect():
+    det = SoftMulti(name="multi")
+    det.set_exposure(0.05)
+    det.stage()
+    try:
+        status = det.trigger()
+        det.i0.target.put(5)
+        status.wait(timeout=2)
+    finally:
+        det.unstage()
+    # A quiet channel does not hold the window open past the deadline
+    assert det.i0.npts.get() == 1
+    assert det.i1.npts.get() == 0
+
+    det.i0.rescale.put(3)
+    det.kickoff().wait(timeout=5)
+    det.i0.target.put(1)
+    det.i1.target.put(2)
+    det.complete().wait(timeout=5)
+    events = list(det.collect())
+    assert [e["data"] for e in events] == [{"multi_i0": 3}, {"multi_i1": 2}]
+
+
+def test_time_weighted_mean_includes_held_value():
+    det = SoftScalar(name="det")
+    det.weighting.put("time")
+    det.set_exposure(10)
+    det.stage()
+    try:
+        # Posted before the trigger, and still held when the window opens
+        det.target.put(4)
+        status = det.trigger()
+        start = time.time()
+        # Held 4 for ~1 s, 0 for 2 s, 10 for ~7 s; the update at the end
+        # closes the window
+        det.target.put(0, timestamp=start + 1)
+        det.target.put(10, timestamp=start + 3)
+        det.target.put(-1, timestamp=start + 10.5)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 3
+    assert abs(det.mean.get() - (4 * 1 + 0 * 2 + 10 * 7) / 10) < 0.01
+    assert det.min.get() == 0 and det.max.get() == 10
+
+
+def test_window_uses_ioc_timestamps():
+    det = SoftScalar(name="det")
+    det.set_exposure(10)
+    det.stage()
+    try:
+        # Sets the clock offset
+        det.target.put(0)
+        status = det.trigger()
+        start = time.time()
+        # Stamped before the trigger but delivered after it
+        det.target.put(100, timestamp=start - 1)
+        for n, v in enumerate([1, 2, 3, -50]):
+            det.target.put(v, timestamp=start + 4 * n)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 3
+    assert np.isclose(det.mean.get(), 2)
+    with pytest.raises(ValueError):
+        det.weighting.put("bad")
+        det.trigger()
+
+
+def test_first_trigger_with_skewed_ioc_clock():
+    det = SoftScalar(name="det")
+    det.set_exposure(0.3)
+    det.stage()
+    try:
+        status = det.trigger()
+        # The IOC clock is 100 s ahead, and nothing has posted since stage
+        for v in range(5):
+            det.target.put(v, timestamp=time.time() + 100)
+            time.sleep(0.02)
+        status.wait(timeout=2)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 5
+    assert np.isclose(det.mean.get(), 2)
+    assert abs(det.clock_offsets[0] + 100) < 0.1
+
+
+def test_adaptive_exposure_stops_on_standard_error():
+    rng = np.random.default_rng(3)
+    det = SoftScalar(name="det", rescale=2)
+    det.set_exposure(100)
+    det.sem_target.put(0.1)
+    det.min_exposure.put(1)
+    det.stage()
+    try:
+        status = det.trigger()
+        start = time.time()
+        # sigma of 1 in calibrated units needs about 100 samples, and
+        # the first second must pass
+        for n, v in enumerate(rng.normal(5, 0.5, 1000)):
+            det.target.put(v, timestamp=start + 0.002 * n)
+            if status.done:
+                break
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    npts = det.npts.get()
+    assert 1000 > npts > 100
+    assert det.std.get() / np.sqrt(npts - 1) < 0.1
+    assert 0.9 < det.elapsed.get() < 1.1
+
+
+def test_adaptive_exposure_uneven_hold_times():
+    det = SoftScalar(name="det")
+    det.weighting.put("time")
+    det.set_exposure(10)
+    det.sem_target.put(0.2)
+    det.stage()
+    try:
+        det.target.put(10)
+        status = det.trigger()
+        start = time.time()
+        # 10 is held for 5 s, then many samples held for 1 ms each. They
+        # give a small variance over many samples, but almost all of the
+        # weight is in one sample
+        for n in range(20):
+            det.target.put(20 * (n % 2), timestamp=start + 5 + 0.001 * n)
+        assert not status.done
+        det.target.put(-1, timestamp=start + 10.5)
+        status.wait(timeout=1)
+    finally:
+        det.unstage()
+    assert det.npts.get() == 21
+    assert np.isclose(det.elapsed.get(), 10)
+
+
+def test_adaptive_exposure_waits_for_every_target():
+    det = SoftMulti(name="multi")
+    det.set_exposure(0.2)
+    det.i0.sem_target.put(1)
+    det.i1.sem_target.put(1e-6)
+    det.stage()
+    try:
+        status = det.trigger()
+        for v in [1, 2, 1, 2]:
+            det.i0.target.put(v)
+            det.i1.target.put(v)
+        assert not status.done
+        status.wait(timeout=2)
+    finally:
+        det.unstage()
+    assert det.i0.npts.get() == det.i1.npts.get() == 4
+    assert np.isclose(det.elapsed.get(), 0.2)
+
+
+def test_dispatcher_batches_updates():
+    dispatcher = ScalarDispatcher(maxsize=10000)
+    dets = [SoftScalar(name=f"det{i}", dispatcher=dispatcher) for i in range(3)]
+    multi = SoftMulti(name="multi", dispatcher=dispatcher)
+    for det in dets:
+        det.set_exposure(10)
+        det.max_points.put(50)
+        det.stage()
+    multi.kickoff().wait(timeout=5)
+    try:
+        statuses = [det.trigger() for det in dets]
+        for v in range(50):
+            for n, det in enumerate(dets):
+                det.target.put(v + n)
+            multi.i0.target.put(v)
+            multi.i1.target.put(-v)
+        for status in statuses:
+            status.wait(timeout=5)
+        multi.complete().wait(timeout=5)
+    finally:
+        for det in dets:
+            det.unstage()
+    for n, det in enumerate(dets):
+        assert det.npts.get() == 50
+        assert np.isclose(det.mean.get(), 24.5 + n)
+    events = list(multi.collect())
+    assert len(events) == 100
+    assert sum(e["data"].get("multi_i1", 0) for e in events) == -sum(range(50))
+    metrics = dispatcher.metrics()
+    assert metrics["received"] == metrics["dispatched"] == 250
+    assert metrics["dropped"] == 0
+    assert 1 <= metrics["batches"] <= 250
+
+
+def test_dispatcher_counts_overflow():
+    release = threading.Event()
+
+    class SlowScalar(SoftScalar):
+        def _receive_many(self, *args):
+            release.wait(timeout=5)
+            super()._receive_many(*args)
+
+    dispatcher = ScalarDispatcher(maxsize=5)
+    det = SlowScalar(name="det", dispatcher=dispatcher)
+    det.kickoff().wait(timeout=5)
+    det.target.put(0)
+    # The dispatcher is now held by the first update, so the queue fills
+    assert not dispatcher.flush(timeout=0.1)
+    for v in range(1, 21):
+        det.target.put(v)
+    release.set()
+    det.complete().wait(timeout=5)
+    metrics = dispatcher.metrics()
+    assert metrics["received"] == 21
+    assert metrics["dispatched"] == 6
+    assert metrics["dropped"] == metrics["dropped_by_device"]["det"] == 15
+    assert metrics["max_queue"] == 5
+    assert [e["data"]["det"] for e in det.collect()] == [0, 1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("dispatched", [True, False])
+def test_callback_error_fails_status(dispatched, caplog):
+    class BrokenScalar(SoftScalar):
+        def _read_sample(self, *args):
+            raise RuntimeError("broken sample")
+
+    dispatcher = ScalarDispatcher() if dispatched else None
+    det = BrokenScalar(name="det", dispatcher=dispatcher)
+    det.set_exposure(10)
+    det.stage()
+    try:
+        status = det.trigger()
+        det.target.put(1)
+        with pytest.raises(RuntimeError, match="broken sample"):
+            status.wait(timeout=2)
+    finally:
+        det.unstage()
+    assert det._window is None
+    if dispatched:
+        assert "Error dispatching updates to det" in caplog.text
@@ -0,0 +1,28 @@
+import numpy as np
+from ophyd.sim import SynAxis
+
+from sst_base.sampleholder import SampleHolder, make_regular_polygon
+from sst_base.sim import SimEdgeDetector, edge_transmission
+
+
+def test_edge_transmission_profiles():
+    assert np.isclose(edge_transmission(0, 0.1), 0.5)
+    assert np.isclose(edge_transmission(0, 0.1, "flat"), 0.5)
+    assert np.allclose(edge_transmission([-1, 1], 0.1, "flat"), [0, 1])
+    assert np.allclose(edge_transmission([-1, 1], 0), [0, 1])
+
+
+def test_sim_edge_detector_scan():
+    holder = SampleHolder(name="bar", geometry=make_regular_polygon(24.5, 215, 4))
+    motors = [SynAxis(name=n) for n in "xyzr"]
+    det = SimEdgeDetector(name="det", holder=holder, manipulator=motors)
+    motors[2].set(-100).wait()
+    for x, expected in [(-20, 1), (-12.25, 0.5), (0, 0)]:
+        motors[0].set(x).wait()
+        det.trigger().wait()
+        assert np.isclose(det.read()["det"]["value"], expected)
+
+    x = np.linspace(-20, 20, 101)
+    vectorized = det.transmission(x, 0, -100, 0)
+    scalar = [det.transmission(xi, 0, -100, 0) for xi in x]
+    assert np.allclose(vectorized, scalar)